@@ -0,0 +1,184 @@
+import argparse
+import csv
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+import snapshot
+from graph import NamesView
+
+HUB = "Kevin Bacon"
+SAMPLES = 256
+WIDTH = 64
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Whole-graph distance analytics for a dataset."
+    )
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--hub", default=HUB,
+                        help="person_id or name to measure distances to")
+    parser.add_argument("--samples", type=int, default=SAMPLES,
+                        help="number of random sources for eccentricities "
+                             "and the distance histogram")
+    parser.add_argument("--width", type=int, default=WIDTH,
+                        help="number of sources searched together")
+    parser.add_argument("--output", default="analytics",
+                        help="directory to write results to")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print("Loading data...")
+    graph = snapshot.load_graph(args.directory)
+    print("Data loaded.")
+    hub = find_person(graph, args.hub)
+    if hub is None:
+        sys.exit(f"Person not found: {args.hub}")
+    os.makedirs(args.output, exist_ok=True)
+
+    start = time.perf_counter()
+    write_hub_distances(graph, hub, os.path.join(args.output, "hub.csv"))
+    print(f"Hub distances written in {time.perf_counter() - start:.3f} s.")
+
+    start = time.perf_counter()
+    components = graph.components()
+    write_components(graph, components,
+                     os.path.join(args.output, "components.csv"),
+                     os.path.join(args.output, "component_sizes.csv"))
+    print(f"Components written in {time.perf_counter() - start:.3f} s.")
+
+    start = time.perf_counter()
+    random.seed(args.seed)
+    people = range(len(graph.person_ids))
+    sources = random.sample(people, min(args.samples, len(people)))
+    write_samples(graph, components, sources, args.width,
+                  os.path.join(args.output, "eccentricity.csv"),
+                  os.path.join(args.output, "distances.csv"))
+    print(f"{len(sources)} sources searched in "
+          f"{time.perf_counter() - start:.3f} s.")
+
+
+def find_person(graph, person):
+    """
+    Returns the person number for a person_id or name, preferring the
+    person with the most movies when a name is shared, or None.
+    """
+    if person in graph.person_index:
+        return graph.person_index[person]
+    matches = [graph.person_index[person_id]
+               for person_id in NamesView(graph).get(person.lower(), ())]
+    if not matches:
+        return None
+    return max(matches, key=lambda p: len(graph.movies_of(p)))
+
+
+def multi_source_bfs(graph, sources):
+    """
+    Runs a BFS from every source person number at once, keeping one bit
+    per source in a Python int for each person reached.
+
+    Yields (distance, reached) for each layer, where reached maps each
+    person first reached at that distance to the bits of the sources
+    that reached them.
+    """
+    seen = {}
+    frontier = {}
+    for bit, source in enumerate(sources):
+        frontier[source] = frontier.get(source, 0) | 1 << bit
+        seen[source] = frontier[source]
+    distance = 0
+    while frontier:
+        yield distance, frontier
+        distance += 1
+
+        # Gather which sources arrive at each movie, so every movie
+        # is expanded at most once per layer for all sources together
+        movie_bits = {}
+        for person, bits in frontier.items():
+            for movie in graph.movies_of(person):
+                movie_bits[movie] = movie_bits.get(movie, 0) | bits
+
+        layer = {}
+        for movie, bits in movie_bits.items():
+            for star in graph.stars_of(movie):
+                new = bits & ~seen.get(star, 0)
+                if new:
+                    seen[star] = seen.get(star, 0) | new
+                    layer[star] = layer.get(star, 0) | new
+        frontier = layer
+
+
+def write_samples(graph, components, sources, width,
+                  eccentricity_file, histogram_file):
+    """
+    Writes each source's eccentricity and number of people reached,
+    and a histogram of distances from all sources to everyone they reach.
+    """
+    # Each source reaches exactly its own component
+    sizes = Counter(components)
+    histogram = Counter()
+    with open(eccentricity_file, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "name", "eccentricity", "reached"])
+        for i in range(0, len(sources), width):
+            batch = sources[i:i + width]
+            eccentricity = [0] * len(batch)
+            for distance, layer in multi_source_bfs(graph, batch):
+                active = 0
+                for bits in layer.values():
+                    active |= bits
+                    histogram[distance] += bits.bit_count()
+                for bit in range(len(batch)):
+                    if active >> bit & 1:
+                        eccentricity[bit] = distance
+            for bit, source in enumerate(batch):
+                writer.writerow([graph.person_ids[source],
+                                 graph.names[source],
+                                 eccentricity[bit],
+                                 sizes[components[source]]])
+            f.flush()
+
+    with open(histogram_file, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["distance", "pairs"])
+        for distance in sorted(histogram):
+            writer.writerow([distance, histogram[distance]])
+
+
+def write_hub_distances(graph, hub, filename):
+    """
+    Streams every person's distance to the hub, blank if not connected.
+    """
+    distances = graph.distances(hub)
+    with open(filename, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "name", "distance"])
+        for person, distance in enumerate(distances):
+            writer.writerow([graph.person_ids[person], graph.names[person],
+                             distance if distance >= 0 else ""])
+
+
+def write_components(graph, components, membership_file, sizes_file):
+    """
+    Streams every person's component number, then the size of each
+    component from largest to smallest.
+    """
+    with open(membership_file, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "component"])
+        for person, component in enumerate(components):
+            writer.writerow([graph.person_ids[person], component])
+
+    sizes = Counter(components)
+    with open(sizes_file, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["component", "size"])
+        for component, size in sizes.most_common():
+            writer.writerow([component, size])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import contextlib
+import io
+import random
+import sys
+import time
+import tracemalloc
+
+import degrees
+import landmarks
+import snapshot
+from graph import Graph
+
+PAIRS = 20
+
+
+def main():
+    if len(sys.argv) > 3:
+        sys.exit("Usage: python benchmark.py [directory] [pairs]")
+    directory = sys.argv[1] if len(sys.argv) > 1 else "large"
+    pairs = int(sys.argv[2]) if len(sys.argv) > 2 else PAIRS
+
+    print("Loading data...")
+    dict_memory = measure(degrees.load_csv, directory)[1]
+    graph, graph_memory = measure(Graph.from_csv, directory)
+    print("Data loaded.")
+    print(f"dicts: {dict_memory / 2 ** 20:.1f} MiB, "
+          f"graph: {graph_memory / 2 ** 20:.1f} MiB")
+
+    random.seed(0)
+    person_ids = list(degrees.people)
+    queries = [tuple(random.sample(person_ids, 2)) for _ in range(pairs)]
+
+    searches = {
+        "bfs": lambda s, t, stats: degrees.shortest_path(
+            s, t, stats=stats),
+        "bidirectional": lambda s, t, stats: degrees.shortest_path(
+            s, t, bidirectional=True, stats=stats),
+        "graph bfs": lambda s, t, stats: graph.shortest_path(
+            s, t, bidirectional=False, stats=stats),
+        "graph bidir": lambda s, t, stats: graph.shortest_path(
+            s, t, bidirectional=True, stats=stats),
+    }
+    # A* needs the index built beforehand by landmarks.py
+    compact = snapshot.load_graph(directory)
+    index = landmarks.load_index(directory, compact)
+    if index is not None:
+        searches["landmark a*"] = lambda s, t, stats: index.shortest_path(
+            s, t, stats=stats)
+    results = {name: run(queries, search) for name, search in searches.items()}
+
+    print(f"{'search':<15}{'expanded':>12}{'seconds':>12}{'expanded/s':>14}")
+    for name, (lengths, stats, seconds) in results.items():
+        expanded = stats.get("expanded", 0)
+        rate = expanded / seconds if seconds else 0
+        print(f"{name:<15}{expanded:>12}{seconds:>12.3f}{rate:>14.0f}")
+
+    # Searches that expand each movie once count the co-star pairs
+    # that expanding per (movie, co-star) pair would have checked
+    print()
+    print(f"{'search':<15}{'movies':>12}{'edges':>12}{'pairs':>12}"
+          f"{'reduction':>12}")
+    for name, (_, stats, _) in results.items():
+        if "pairs" not in stats:
+            continue
+        movies, edges, pairs = stats["movies"], stats["edges"], stats["pairs"]
+        reduction = pairs / edges if edges else 0
+        print(f"{name:<15}{movies:>12}{edges:>12}{pairs:>12}"
+              f"{reduction:>11.1f}x")
+
+    if len(set(tuple(lengths) for lengths, _, _ in results.values())) > 1:
+        sys.exit("Path lengths differ between searches.")
+
+
+def measure(function, *args):
+    """
+    Calls a function, returning its result and the bytes of memory
+    still allocated by the call once it has returned.
+    """
+    tracemalloc.start()
+    value = function(*args)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size
+
+
+def run(queries, search):
+    """
+    Runs every (source, target) query with one search, returning the
+    path lengths found, the search's work counters and total wall time.
+    """
+    lengths = []
+    stats = {}
+    start = time.perf_counter()
+    for source, target in queries:
+        # Plain BFS prints each step of the path it finds
+        with contextlib.redirect_stdout(io.StringIO()):
+            path = search(source, target, stats)
+        lengths.append(None if path is None else len(path))
+    return lengths, stats, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
 import csv
+import itertools
 import sys
 
+import landmarks
+import snapshot
+from graph import MoviesView, NamesView, PeopleView
 from util import Node, StackFrontier, QueueFrontier
 
 # Maps names to a set of corresponding person_ids
@@ -12,8 +16,46 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Compact graph that names, people and movies are views of once loaded
+graph = None
+
+# Landmark distance index for the graph, if one has been built
+landmark_index = None
+
+# Edit distance and number of close names offered for unknown names,
+# with the distance widened to MORE_TYPOS only when none are that close
+TYPOS = 1
+MORE_TYPOS = 2
+SUGGESTIONS = 10
+
 
 def load_data(directory):
+    """
+    Load data into memory from the binary snapshot next to the CSV files,
+    rebuilding the snapshot first if any CSV file has changed.
+    """
+    global graph, landmark_index, names, people, movies
+    graph = snapshot.load_graph(directory)
+    landmark_index = landmarks.load_index(directory, graph)
+    names = NamesView(graph)
+    people = PeopleView(graph)
+    movies = MoviesView(graph)
+
+
+def apply_updates(directory):
+    """
+    Apply rows appended to the CSV files since load_data, patching the
+    loaded data, its snapshot and any landmark index without a reload.
+
+    Raises ValueError if a CSV file has changed other than by appending.
+    """
+    changes = snapshot.update_graph(directory, graph)
+    if landmark_index is not None:
+        landmark_index.save(directory)
+    return changes
+
+
+def load_csv(directory):
     """
     Load data from CSV files into memory.
     """
@@ -69,7 +111,10 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    if landmark_index is not None:
+        path = landmark_index.shortest_path(source, target)
+    else:
+        path = graph.shortest_path(source, target, bidirectional=True)
 
     if path is None:
         print("Not connected.")
@@ -84,13 +129,20 @@ def main():
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def shortest_path(source, target, bidirectional=False, stats=None):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
     If no possible path, returns None.
+
+    With `bidirectional`, the search grows from both ends and meets
+    in the middle. If `stats` is a dict, work done is counted in it
+    (see expand_person).
     """
+    if bidirectional:
+        return bidirectional_path(source, target, stats)
+
     # States are actors
     # Actions are movies
 
@@ -100,6 +152,7 @@ def shortest_path(source, target):
     frontier.add(start)
 
     explored = set()
+    explored_movies = set()
 
 
     while True:
@@ -124,37 +177,206 @@ def shortest_path(source, target):
         explored.add(node.state)
 
         # Add children to the frontier
-        for action, state in neighbors_for_person(node.state):
+        for action, state in expand_person(node.state, explored_movies, stats):
             if not frontier.contains_state(state) and state not in explored:
                 child = Node(state=state, parent=node, action=action)
                 frontier.add(child)
 
+
+def all_shortest_paths(source, target):
+    """
+    Yields every shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, one at a time.
+    """
+    return graph.all_shortest_paths(source, target)
+
+
+def k_shortest_paths(source, target, k):
+    """
+    Yields up to k lists of (movie_id, person_id) pairs that connect
+    the source to the target without revisiting anyone, shortest first.
+    """
+    return itertools.islice(graph.shortest_simple_paths(source, target), k)
+
+
+def bidirectional_path(source, target, stats=None):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, searching breadth-first
+    from both ends until the two frontiers meet.
+
+    If no possible path, returns None.
+    """
+    if source == target:
+        return []
+
+    # Each side maps a person to the (movie_id, person_id) step that
+    # reached them: towards the source going forwards, towards the
+    # target going backwards
+    forward = {source: None}
+    backward = {target: None}
+    # Movies each side has already expanded
+    forward_movies = set()
+    backward_movies = set()
+    forward_frontier = [source]
+    backward_frontier = [target]
+
+    while forward_frontier and backward_frontier:
+        # Always grow the smaller frontier by one whole layer
+        if len(forward_frontier) <= len(backward_frontier):
+            forward_frontier, meeting = expand_layer(
+                forward_frontier, forward, backward, forward_movies, stats
+            )
+        else:
+            backward_frontier, meeting = expand_layer(
+                backward_frontier, backward, forward, backward_movies, stats
+            )
+        if meeting is not None:
+            return join_paths(meeting, forward, backward)
+
+    # One side ran out of people without meeting the other
+    return None
+
+
+def expand_layer(frontier, parents, other, explored_movies, stats=None):
+    """
+    Expands every person in one layer of a bidirectional search.
+
+    Returns the next layer and the person where the two searches met,
+    or None if they have not met yet. Meetings are compared across the
+    whole layer, so the one closest to the other side's start wins.
+    """
+    layer = []
+    meeting = None
+    best = None
+    for person_id in frontier:
+        for movie_id, neighbor_id in expand_person(
+            person_id, explored_movies, stats
+        ):
+            if neighbor_id in parents:
+                continue
+            parents[neighbor_id] = (movie_id, person_id)
+            layer.append(neighbor_id)
+            if neighbor_id in other:
+                depth = search_depth(neighbor_id, other)
+                if best is None or depth < best:
+                    meeting, best = neighbor_id, depth
+    return layer, meeting
+
+
+def expand_person(person_id, explored_movies, stats=None):
+    """
+    Yields (movie_id, person_id) pairs for people who starred with a
+    given person, in movies not yet in `explored_movies`, and adds
+    those movies to it. Each movie is only ever expanded once, rather
+    than once for every one of its stars.
+
+    If `stats` is a dict, it counts people "expanded", "movies" expanded,
+    co-star "edges" yielded, and the co-star "pairs" that expanding
+    every movie of every person would have yielded.
+    """
+    if stats is not None:
+        stats["expanded"] = stats.get("expanded", 0) + 1
+    for movie_id in people[person_id]["movies"]:
+        stars = movies[movie_id]["stars"]
+        if stats is not None:
+            stats["pairs"] = stats.get("pairs", 0) + len(stars)
+        if movie_id in explored_movies:
+            continue
+        explored_movies.add(movie_id)
+        if stats is not None:
+            stats["movies"] = stats.get("movies", 0) + 1
+            stats["edges"] = stats.get("edges", 0) + len(stars)
+        for star_id in stars:
+            yield movie_id, star_id
+
+
+def search_depth(person_id, parents):
+    """
+    Returns how many steps a person is from the start of a search.
+    """
+    depth = 0
+    while parents[person_id] is not None:
+        person_id = parents[person_id][1]
+        depth += 1
+    return depth
+
+
+def join_paths(meeting, forward, backward):
+    """
+    Joins the two halves of a bidirectional search at the meeting person
+    into a list of (movie_id, person_id) pairs from source to target.
+    """
+    path = []
+    person_id = meeting
+    while forward[person_id] is not None:
+        movie_id, parent_id = forward[person_id]
+        path.append((movie_id, person_id))
+        person_id = parent_id
+    path.reverse()
+
+    person_id = meeting
+    while backward[person_id] is not None:
+        movie_id, child_id = backward[person_id]
+        path.append((movie_id, child_id))
+        person_id = child_id
+    return path
+
+
 def person_id_for_name(name):
     """
     Returns the IMDB id for a person's name,
-    resolving ambiguities as needed.
+    resolving ambiguities and offering close names as needed.
     """
     person_ids = list(names.get(name.lower(), set()))
     if len(person_ids) == 0:
-        return None
+        person_ids = similar_people(name)
+        if not person_ids:
+            return None
+        print(f"No '{name}'. Did you mean:")
+        return choose_person(person_ids)
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
-        for person_id in person_ids:
-            person = people[person_id]
-            name = person["name"]
-            birth = person["birth"]
-            print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
-        try:
-            person_id = input("Intended Person ID: ")
-            if person_id in person_ids:
-                return person_id
-        except ValueError:
-            pass
-        return None
+        return choose_person(person_ids)
     else:
         return person_ids[0]
 
 
+def choose_person(person_ids):
+    """
+    Lists people and returns the IMDB id the user picks from them.
+    """
+    for person_id in person_ids:
+        person = people[person_id]
+        name = person["name"]
+        birth = person["birth"]
+        print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
+    try:
+        person_id = input("Intended Person ID: ")
+        if person_id in person_ids:
+            return person_id
+    except ValueError:
+        pass
+    return None
+
+
+def similar_people(name, limit=SUGGESTIONS):
+    """
+    Returns the IMDB ids of people whose names are within a small edit
+    distance of a name or start with it, closest first.
+    """
+    if graph is None:
+        return []
+    index = graph.name_index()
+    close = index.fuzzy(name, TYPOS, limit)
+    if not close:
+        close = index.fuzzy(name, MORE_TYPOS, limit)
+    found = [person for _, person in close]
+    found += [person for person in index.complete(name, limit)
+              if person not in found]
+    return [graph.person_ids[person] for person in found[:limit]]
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
@@ -0,0 +1,762 @@
+import csv
+import heapq
+import itertools
+from array import array
+from collections.abc import Mapping
+
+from nameindex import NameIndex
+
+
+class Graph():
+    """
+    Compact person-movie graph for the degrees dataset.
+
+    People and movies are numbered densely from 0 in file order, and the
+    bipartite graph between them is stored twice in CSR form: the movies
+    of person p are person_movies[person_offsets[p]:person_offsets[p + 1]]
+    and the stars of movie m are movie_stars[movie_offsets[m]:movie_offsets[m + 1]].
+
+    Rows appended later by apply_rows are kept beside the arrays,
+    and functions in `listeners` are told about each change.
+    """
+
+    def __init__(self, person_ids, names, births, movie_ids, titles, years,
+                 person_offsets, person_movies, movie_offsets, movie_stars,
+                 person_index=None, movie_index=None, name_order=None):
+        self.person_ids = person_ids
+        self.names = names
+        self.births = births
+        self.movie_ids = movie_ids
+        self.titles = titles
+        self.years = years
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_stars = movie_stars
+        # Maps from IDs to numbers, built here unless supplied
+        if person_index is None:
+            person_index = {pid: i for i, pid in enumerate(person_ids)}
+        if movie_index is None:
+            movie_index = {mid: i for i, mid in enumerate(movie_ids)}
+        self.person_index = person_index
+        self.movie_index = movie_index
+        # (lowercase names, person numbers) sorted by name, if already
+        # known, and the NameIndex over them once it is first needed
+        self.name_order = name_order
+        self.names_index = None
+
+        # People and movies covered by the arrays, and appended
+        # person -> movies and movie -> stars beyond them
+        self.base_people = len(person_offsets) - 1
+        self.base_movies = len(movie_offsets) - 1
+        self.extra_movies = {}
+        self.extra_stars = {}
+        self.listeners = []
+
+    @classmethod
+    def from_csv(cls, directory):
+        """
+        Loads people.csv, movies.csv and stars.csv from a directory.
+        """
+        person_ids, names, births = read_columns(
+            f"{directory}/people.csv", ("id", "name", "birth")
+        )
+        movie_ids, titles, years = read_columns(
+            f"{directory}/movies.csv", ("id", "title", "year")
+        )
+        star_people, star_movies = read_columns(
+            f"{directory}/stars.csv", ("person_id", "movie_id")
+        )
+
+        # Stars rows for unknown people or movies are skipped,
+        # and repeated rows are only counted once
+        person_index = {pid: i for i, pid in enumerate(person_ids)}
+        movie_index = {mid: i for i, mid in enumerate(movie_ids)}
+        edges = set()
+        for person_id, movie_id in zip(star_people, star_movies):
+            try:
+                edges.add((person_index[person_id], movie_index[movie_id]))
+            except KeyError:
+                pass
+
+        person_offsets, person_movies = build_csr(
+            len(person_ids), ((p, m) for p, m in edges)
+        )
+        movie_offsets, movie_stars = build_csr(
+            len(movie_ids), ((m, p) for p, m in edges)
+        )
+        return cls(person_ids, names, births, movie_ids, titles, years,
+                   person_offsets, person_movies, movie_offsets, movie_stars,
+                   person_index, movie_index)
+
+    def movies_of(self, person):
+        """
+        Returns the movie numbers a person number starred in.
+        """
+        if self.extra_movies:
+            return self.extended(person, self.base_people, self.person_offsets,
+                                 self.person_movies, self.extra_movies)
+        offsets = self.person_offsets
+        return self.person_movies[offsets[person]:offsets[person + 1]]
+
+    def stars_of(self, movie):
+        """
+        Returns the person numbers who starred in a movie number.
+        """
+        if self.extra_stars:
+            return self.extended(movie, self.base_movies, self.movie_offsets,
+                                 self.movie_stars, self.extra_stars)
+        offsets = self.movie_offsets
+        return self.movie_stars[offsets[movie]:offsets[movie + 1]]
+
+    def extended(self, source, base, offsets, targets, extra):
+        """
+        Returns a source's targets from the arrays plus any appended ones.
+        """
+        if source < base:
+            found = targets[offsets[source]:offsets[source + 1]]
+        else:
+            found = ()
+        if source in extra:
+            return [*found, *extra[source]]
+        return found
+
+    def name_index(self):
+        """
+        Returns the NameIndex for people's names, building it on first use.
+        """
+        if self.names_index is None:
+            if self.name_order is not None:
+                self.names_index = NameIndex(*self.name_order)
+            else:
+                self.names_index = NameIndex.build(self.names)
+            # Add anyone appended since the names were sorted, and later
+            self.names_index.add(
+                range(len(self.names_index.order), len(self.names)),
+                self.names
+            )
+            self.listeners.append(self.update_names)
+        return self.names_index
+
+    def update_names(self, new_people, new_movies, touched):
+        """
+        Adds people appended to the graph to its NameIndex.
+        """
+        self.names_index.add(new_people, self.names)
+
+    def apply_rows(self, people_rows=(), movies_rows=(), stars_rows=()):
+        """
+        Adds rows appended to people.csv, movies.csv and stars.csv,
+        given as dicts like csv.DictReader's, without rebuilding the
+        arrays. Rows already in the graph are skipped.
+
+        Returns the new person numbers, the new movie numbers and the
+        set of movie numbers that gained stars, after passing the same
+        three to every function in `listeners`.
+        """
+        if not isinstance(self.person_ids, Extended):
+            # Columns read from a snapshot cannot grow in place
+            for name in ("person_ids", "names", "births",
+                         "movie_ids", "titles", "years"):
+                setattr(self, name, Extended(getattr(self, name)))
+            self.person_index = ExtendedIndex(self.person_index)
+            self.movie_index = ExtendedIndex(self.movie_index)
+
+        new_people = []
+        for row in people_rows:
+            if row["id"] in self.person_index:
+                continue
+            # People beyond the arrays only have appended movies
+            self.extra_movies[len(self.person_ids)] = []
+            self.person_index[row["id"]] = len(self.person_ids)
+            new_people.append(len(self.person_ids))
+            self.person_ids.append(row["id"])
+            self.names.append(row["name"])
+            self.births.append(row["birth"])
+
+        new_movies = []
+        for row in movies_rows:
+            if row["id"] in self.movie_index:
+                continue
+            self.extra_stars[len(self.movie_ids)] = []
+            self.movie_index[row["id"]] = len(self.movie_ids)
+            new_movies.append(len(self.movie_ids))
+            self.movie_ids.append(row["id"])
+            self.titles.append(row["title"])
+            self.years.append(row["year"])
+
+        touched = set()
+        for row in stars_rows:
+            person = self.person_index.get(row["person_id"])
+            movie = self.movie_index.get(row["movie_id"])
+            if person is None or movie is None:
+                continue
+            if movie in self.movies_of(person):
+                continue
+            self.extra_movies.setdefault(person, []).append(movie)
+            self.extra_stars.setdefault(movie, []).append(person)
+            touched.add(movie)
+
+        for listener in self.listeners:
+            listener(new_people, new_movies, touched)
+        return new_people, new_movies, touched
+
+    def csr(self):
+        """
+        Returns (person_offsets, person_movies, movie_offsets, movie_stars)
+        with any appended rows merged into the arrays.
+        """
+        if (not self.extra_movies
+                and len(self.person_ids) == self.base_people
+                and len(self.movie_ids) == self.base_movies):
+            return (self.person_offsets, self.person_movies,
+                    self.movie_offsets, self.movie_stars)
+        person_offsets, person_movies = merge_csr(
+            len(self.person_ids), self.movies_of
+        )
+        movie_offsets, movie_stars = merge_csr(
+            len(self.movie_ids), self.stars_of
+        )
+        return person_offsets, person_movies, movie_offsets, movie_stars
+
+    def distances(self, source):
+        """
+        Returns an array of how many steps every person number is from
+        the source person number, with -1 for people not connected to it.
+        """
+        distance = array("i", [-1]) * len(self.person_ids)
+        distance[source] = 0
+        expanded = bytearray(len(self.movie_ids))
+        frontier = [source]
+        depth = 0
+        while frontier:
+            depth += 1
+            layer = []
+            for person in frontier:
+                for movie in self.movies_of(person):
+                    if expanded[movie]:
+                        continue
+                    expanded[movie] = 1
+                    for star in self.stars_of(movie):
+                        if distance[star] == -1:
+                            distance[star] = depth
+                            layer.append(star)
+            frontier = layer
+        return distance
+
+    def components(self):
+        """
+        Returns an array labelling every person number with the number
+        of their connected component, counting from 0.
+        """
+        label = array("i", [-1]) * len(self.person_ids)
+        expanded = bytearray(len(self.movie_ids))
+        count = 0
+        for start in range(len(label)):
+            if label[start] != -1:
+                continue
+            label[start] = count
+            frontier = [start]
+            while frontier:
+                person = frontier.pop()
+                for movie in self.movies_of(person):
+                    if expanded[movie]:
+                        continue
+                    expanded[movie] = 1
+                    for star in self.stars_of(movie):
+                        if label[star] == -1:
+                            label[star] = count
+                            frontier.append(star)
+            count += 1
+        return label
+
+    def shortest_path(self, source, target, bidirectional=True, stats=None):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source person_id to the target person_id.
+
+        If no possible path, returns None. If `stats` is a dict, work
+        done is counted in it as in degrees.expand_person.
+        """
+        source = self.person_index[source]
+        target = self.person_index[target]
+        if bidirectional:
+            steps = self.bidirectional_search(source, target, stats)
+        else:
+            steps = self.breadth_first_search(source, target, stats)
+        if steps is None:
+            return None
+        return [(self.movie_ids[movie], self.person_ids[person])
+                for movie, person in steps]
+
+    def breadth_first_search(self, source, target, stats=None):
+        """
+        Returns the shortest list of (movie, person) numbers from source
+        to target found by BFS, or None if they are not connected.
+        """
+        # Each person maps to the movie they were reached through, and
+        # each movie to the person who expanded it, so a movie is only
+        # ever expanded once
+        reached = {source: -1}
+        expanded_by = {}
+        if source == target:
+            return []
+
+        frontier = [source]
+        while frontier:
+            layer = []
+            for person in frontier:
+                if stats is not None:
+                    stats["expanded"] = stats.get("expanded", 0) + 1
+                for movie in self.movies_of(person):
+                    if movie in expanded_by:
+                        if stats is not None:
+                            count_movie(stats, self, movie, False)
+                        continue
+                    expanded_by[movie] = person
+                    if stats is not None:
+                        count_movie(stats, self, movie, True)
+                    for star in self.stars_of(movie):
+                        if star in reached:
+                            continue
+                        reached[star] = movie
+                        if star == target:
+                            return trace(target, reached, expanded_by)[::-1]
+                        layer.append(star)
+            frontier = layer
+        return None
+
+    def bidirectional_search(self, source, target, stats=None):
+        """
+        Returns the shortest list of (movie, person) numbers from source
+        to target, growing BFS layers from both ends until they meet,
+        or None if they are not connected.
+        """
+        if source == target:
+            return []
+        forward = ({source: -1}, {})
+        backward = ({target: -1}, {})
+        forward_frontier = [source]
+        backward_frontier = [target]
+
+        while forward_frontier and backward_frontier:
+            # Always grow the smaller frontier by one whole layer
+            if len(forward_frontier) <= len(backward_frontier):
+                forward_frontier, meeting = self.expand_layer(
+                    forward_frontier, forward, backward, stats
+                )
+            else:
+                backward_frontier, meeting = self.expand_layer(
+                    backward_frontier, backward, forward, stats
+                )
+            if meeting is not None:
+                head = trace(meeting, *forward)[::-1]
+                tail = trace(meeting, *backward)
+                # The backward half records each movie against the person
+                # nearer the meeting, so shift people one step along it
+                people = [person for _, person in tail[1:]] + [target]
+                return head + [(movie, person)
+                               for (movie, _), person in zip(tail, people)]
+        return None
+
+    def expand_layer(self, frontier, side, other, stats=None):
+        """
+        Expands one layer of a bidirectional search, returning the next
+        layer and the meeting person closest to the other side's start,
+        or None if the searches have not met.
+        """
+        reached, expanded_by = side
+        layer = []
+        meeting = None
+        best = None
+        for person in frontier:
+            if stats is not None:
+                stats["expanded"] = stats.get("expanded", 0) + 1
+            for movie in self.movies_of(person):
+                if movie in expanded_by:
+                    if stats is not None:
+                        count_movie(stats, self, movie, False)
+                    continue
+                expanded_by[movie] = person
+                if stats is not None:
+                    count_movie(stats, self, movie, True)
+                for star in self.stars_of(movie):
+                    if star in reached:
+                        continue
+                    reached[star] = movie
+                    layer.append(star)
+                    if star in other[0]:
+                        depth = len(trace(star, *other))
+                        if best is None or depth < best:
+                            meeting, best = star, depth
+        return layer, meeting
+
+    def all_shortest_paths(self, source, target):
+        """
+        Yields every shortest list of (movie_id, person_id) pairs that
+        connects the source person_id to the target person_id, lazily,
+        so callers can stop after the first few. Yields nothing if they
+        are not connected.
+        """
+        for steps in self.shortest_steps(self.person_index[source],
+                                         self.person_index[target]):
+            yield self.to_ids(steps)
+
+    def shortest_simple_paths(self, source, target):
+        """
+        Yields lists of (movie_id, person_id) pairs connecting the source
+        person_id to the target person_id that never revisit a person,
+        shortest first, by Yen's algorithm. Take the first k for the
+        k shortest simple paths.
+        """
+        source = self.person_index[source]
+        target = self.person_index[target]
+        first = self.restricted_search(source, target, set(), set())
+        if first is None:
+            return
+        found = [first]
+        seen = {first}
+        candidates = []
+        counter = itertools.count()
+        while True:
+            yield self.to_ids(found[-1])
+
+            # Branch off every person on the last path in turn, banning
+            # the steps that earlier paths with the same root took next
+            last = found[-1]
+            people = [source] + [person for _, person in last]
+            for i in range(len(last)):
+                root = last[:i]
+                banned_steps = {(people[i],) + path[i] for path in found
+                                if path[:i] == root}
+                spur = self.restricted_search(
+                    people[i], target, set(people[:i]), banned_steps
+                )
+                if spur is None:
+                    continue
+                path = root + spur
+                if path not in seen:
+                    seen.add(path)
+                    heapq.heappush(candidates,
+                                   (len(path), next(counter), path))
+            if not candidates:
+                return
+            found.append(heapq.heappop(candidates)[2])
+
+    def to_ids(self, steps):
+        """
+        Returns (movie, person) number steps as (movie_id, person_id) pairs.
+        """
+        return [(self.movie_ids[movie], self.person_ids[person])
+                for movie, person in steps]
+
+    def shortest_steps(self, source, target):
+        """
+        Yields every shortest tuple of (movie, person) numbers from
+        source to target, walking the BFS layer DAG back from the target.
+        """
+        depth = self.depths(source, target)
+        if depth is None:
+            return
+
+        # Predecessors in the layer DAG, found once per person when the
+        # walk first needs them
+        dag = {}
+
+        def predecessors(person):
+            if person not in dag:
+                previous = depth[person] - 1
+                dag[person] = [(movie, star)
+                               for movie in self.movies_of(person)
+                               for star in self.stars_of(movie)
+                               if depth.get(star) == previous]
+            return dag[person]
+
+        # Depth-first walk keeping one iterator per person on the path
+        steps = []
+        stack = [(target, iter(predecessors(target)))]
+        if target == source:
+            yield ()
+            return
+        while stack:
+            person, choices = stack[-1]
+            choice = next(choices, None)
+            if choice is None:
+                stack.pop()
+                if steps:
+                    steps.pop()
+                continue
+            movie, previous = choice
+            steps.append((movie, person))
+            if previous == source:
+                yield tuple(reversed(steps))
+                steps.pop()
+            else:
+                stack.append((previous, iter(predecessors(previous))))
+
+    def depths(self, source, target):
+        """
+        Returns the BFS depth from source of every person number nearer
+        to it than the target, and of the target, or None if the target
+        is not connected to the source.
+        """
+        depth = {source: 0}
+        expanded = set()
+        frontier = [source]
+        while frontier and target not in depth:
+            layer = []
+            for person in frontier:
+                for movie in self.movies_of(person):
+                    if movie in expanded:
+                        continue
+                    expanded.add(movie)
+                    for star in self.stars_of(movie):
+                        if star not in depth:
+                            depth[star] = depth[person] + 1
+                            layer.append(star)
+            frontier = layer
+        if target not in depth:
+            return None
+        return depth
+
+    def restricted_search(self, source, target, banned_people, banned_steps):
+        """
+        Returns the shortest tuple of (movie, person) numbers from source
+        to target by BFS that avoids banned people and banned
+        (person, movie, person) steps, or None if there is none.
+        """
+        if source == target:
+            return ()
+        parents = {source: None}
+        frontier = [source]
+        while frontier:
+            layer = []
+            for person in frontier:
+                for movie in self.movies_of(person):
+                    for star in self.stars_of(movie):
+                        if (star in parents or star in banned_people
+                                or (person, movie, star) in banned_steps):
+                            continue
+                        parents[star] = (movie, person)
+                        if star == target:
+                            steps = []
+                            while parents[star] is not None:
+                                movie, previous = parents[star]
+                                steps.append((movie, star))
+                                star = previous
+                            return tuple(reversed(steps))
+                        layer.append(star)
+            frontier = layer
+        return None
+
+
+class PeopleView(Mapping):
+    """
+    Read-only view of a Graph shaped like the `people` dict in degrees:
+    person_id -> {"name", "birth", "movies": set of movie_ids}.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, person_id):
+        graph = self.graph
+        person = graph.person_index[person_id]
+        return {
+            "name": graph.names[person],
+            "birth": graph.births[person],
+            "movies": {graph.movie_ids[m] for m in graph.movies_of(person)}
+        }
+
+    def __iter__(self):
+        return iter(self.graph.person_ids)
+
+    def __len__(self):
+        return len(self.graph.person_ids)
+
+    def __contains__(self, person_id):
+        return person_id in self.graph.person_index
+
+
+class MoviesView(Mapping):
+    """
+    Read-only view of a Graph shaped like the `movies` dict in degrees:
+    movie_id -> {"title", "year", "stars": set of person_ids}.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, movie_id):
+        graph = self.graph
+        movie = graph.movie_index[movie_id]
+        return {
+            "title": graph.titles[movie],
+            "year": graph.years[movie],
+            "stars": {graph.person_ids[p] for p in graph.stars_of(movie)}
+        }
+
+    def __iter__(self):
+        return iter(self.graph.movie_ids)
+
+    def __len__(self):
+        return len(self.graph.movie_ids)
+
+    def __contains__(self, movie_id):
+        return movie_id in self.graph.movie_index
+
+
+class NamesView(Mapping):
+    """
+    Read-only view of a Graph shaped like the `names` dict in degrees:
+    lowercase name -> set of person_ids, answered from its NameIndex.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, name):
+        people = self.graph.name_index().lookup(name)
+        if not people or name != name.lower():
+            raise KeyError(name)
+        return {self.graph.person_ids[person] for person in people}
+
+    def __iter__(self):
+        index = self.graph.name_index()
+        seen = None
+        for name in index.keys:
+            if name != seen:
+                yield name
+                seen = name
+        for name, people in index.extra.items():
+            # Only names missing from the sorted order are new
+            if len(index.lookup(name)) == len(people):
+                yield name
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class Extended():
+    """
+    Sequence that appends to a read-only base sequence.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.extra = []
+
+    def __len__(self):
+        return len(self.base) + len(self.extra)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if i < len(self.base):
+            return self.base[i]
+        return self.extra[i - len(self.base)]
+
+    def __iter__(self):
+        return itertools.chain(self.base, self.extra)
+
+    def append(self, value):
+        self.extra.append(value)
+
+
+class ExtendedIndex():
+    """
+    Mapping that adds keys to a read-only base mapping.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.extra = {}
+
+    def __len__(self):
+        return len(self.base) + len(self.extra)
+
+    def __getitem__(self, key):
+        if key in self.extra:
+            return self.extra[key]
+        return self.base[key]
+
+    def __setitem__(self, key, value):
+        self.extra[key] = value
+
+    def __contains__(self, key):
+        return key in self.extra or key in self.base
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+def count_movie(stats, graph, movie, expanded):
+    """
+    Counts one movie met during a search in `stats`, as in
+    degrees.expand_person.
+    """
+    stars = len(graph.stars_of(movie))
+    stats["pairs"] = stats.get("pairs", 0) + stars
+    if expanded:
+        stats["movies"] = stats.get("movies", 0) + 1
+        stats["edges"] = stats.get("edges", 0) + stars
+
+
+def trace(person, reached, expanded_by):
+    """
+    Returns the (movie, person) steps from a person back to the start
+    of the search that reached them, nearest step first.
+    """
+    steps = []
+    movie = reached[person]
+    while movie != -1:
+        steps.append((movie, person))
+        person = expanded_by[movie]
+        movie = reached[person]
+    return steps
+
+
+def read_columns(filename, fields):
+    """
+    Returns one list per field holding that column of a CSV file.
+    """
+    with open(filename, encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        indexes = [header.index(field) for field in fields]
+        columns = tuple([] for _ in fields)
+        for row in reader:
+            for column, index in zip(columns, indexes):
+                column.append(row[index])
+    return columns
+
+
+def merge_csr(size, targets_of):
+    """
+    Returns (offsets, targets) arrays listing targets_of(source)
+    for every source numbered 0 to size - 1.
+    """
+    offsets = array("i", [0])
+    targets = array("i")
+    for source in range(size):
+        targets.extend(targets_of(source))
+        offsets.append(len(targets))
+    return offsets, targets
+
+
+def build_csr(size, pairs):
+    """
+    Returns (offsets, targets) arrays grouping (source, target) pairs
+    by source number, for sources numbered 0 to size - 1.
+    """
+    pairs = sorted(pairs)
+    offsets = array("i", bytes(4 * (size + 1)))
+    for source, _ in pairs:
+        offsets[source + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+    targets = array("i", [target for _, target in pairs])
+    return offsets, targets
@@ -0,0 +1,340 @@
+import argparse
+import heapq
+import itertools
+import mmap
+import os
+import struct
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import snapshot
+
+# Bump whenever the layout below changes, so old indexes are rebuilt
+VERSION = 1
+MAGIC = b"LANDMARK"
+FILENAME = "landmarks.index"
+LANDMARKS = 16
+
+# Distances are stored in one byte each, so longer ones are capped
+UNREACHABLE = 255
+
+# Header: magic, version, landmark count, person count,
+# then (size, mtime_ns) for each source CSV as in the snapshot
+HEADER = struct.Struct("<8sIIq")
+
+# Graph loaded once per build worker
+graph = None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the landmark distance index for a dataset."
+    )
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--count", type=int, default=LANDMARKS,
+                        help="number of landmark people")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of worker processes")
+    args = parser.parse_args()
+
+    print("Loading data...")
+    graph = snapshot.load_graph(args.directory)
+    print("Data loaded.")
+
+    start = time.perf_counter()
+    index = build_index(args.directory, args.count, args.workers, graph)
+    index.save(args.directory)
+    print(f"Indexed {len(index.landmarks)} landmarks in "
+          f"{time.perf_counter() - start:.3f} seconds.")
+
+
+def load(directory):
+    """
+    Loads the graph for this process.
+    """
+    global graph
+    graph = snapshot.load_graph(directory)
+
+
+def landmark_distances(landmark):
+    """
+    Returns the byte distances from a landmark to every person.
+    """
+    return bytes(min(d, UNREACHABLE) if d >= 0 else UNREACHABLE
+                 for d in graph.distances(landmark))
+
+
+def choose_landmarks(graph, count):
+    """
+    Returns up to `count` person numbers to use as landmarks: the people
+    with the most movies, skipping anyone who shares a movie with an
+    earlier choice so the landmarks are spread across the graph.
+    """
+    people = sorted(range(len(graph.person_ids)),
+                    key=lambda p: len(graph.movies_of(p)), reverse=True)
+    chosen = []
+    covered = set()
+    for person in people:
+        if len(chosen) == count or not len(graph.movies_of(person)):
+            break
+        if person in covered:
+            continue
+        chosen.append(person)
+        for movie in graph.movies_of(person):
+            covered.update(graph.stars_of(movie))
+    return chosen
+
+
+def build_index(directory, count=LANDMARKS, workers=None, graph=None):
+    """
+    Returns a LandmarkIndex for the graph loaded from a directory,
+    running one BFS per landmark across a pool of worker processes.
+    The graph is loaded here unless it is passed in.
+    """
+    if graph is None:
+        graph = snapshot.load_graph(directory)
+    landmarks = choose_landmarks(graph, count)
+    with ProcessPoolExecutor(max_workers=workers, initializer=load,
+                             initargs=(directory,)) as pool:
+        distances = list(pool.map(landmark_distances, landmarks))
+    return LandmarkIndex(graph, landmarks, graph.components(), distances)
+
+
+def load_index(directory, graph):
+    """
+    Returns the saved LandmarkIndex for a directory's graph,
+    or None if there is none or the CSVs have changed since.
+    """
+    filename = os.path.join(directory, FILENAME)
+    try:
+        with open(filename, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    view = memoryview(buffer)
+    try:
+        magic, version, count, size = HEADER.unpack_from(view, 0)
+        position = HEADER.size
+        signature = []
+        for _ in snapshot.SOURCES:
+            signature.append(snapshot.SIGNATURE.unpack_from(view, position))
+            position += snapshot.SIGNATURE.size
+    except struct.error:
+        return None
+    if ((magic, version, size) != (MAGIC, VERSION, len(graph.person_ids))
+            or signature != snapshot.source_signature(directory)):
+        return None
+    # A truncated or padded file would cast or slice past its data
+    if len(view) != position + 4 * count + 4 * size + count * size:
+        return None
+
+    landmarks = view[position:position + 4 * count].cast("i")
+    position += 4 * count
+    components = view[position:position + 4 * size].cast("i")
+    position += 4 * size
+    distances = [view[position + i * size:position + (i + 1) * size]
+                 for i in range(count)]
+    index = LandmarkIndex(graph, landmarks, components, distances)
+    # Keep the mapping open for as long as the index is alive
+    index.buffer = buffer
+    return index
+
+
+class LandmarkIndex():
+    """
+    Distances from a few landmark people to everyone, used as lower
+    bounds on the distance between any two people (the ALT heuristic),
+    plus connected component labels for every person.
+    """
+
+    def __init__(self, graph, landmarks, components, distances):
+        self.graph = graph
+        self.landmarks = landmarks
+        self.components = components
+        self.distances = distances
+        graph.listeners.append(self.update)
+
+    def update(self, new_people, new_movies, touched):
+        """
+        Patches distances and components for rows appended to the graph.
+
+        Appended stars can only shorten distances, so each landmark's
+        distances are relaxed outwards from the movies that gained stars,
+        and the components those movies now join are merged.
+        """
+        graph = self.graph
+        # Distances and components read from a file cannot be changed
+        self.components = array("i", self.components)
+        self.distances = [bytearray(d) for d in self.distances]
+
+        label = max(self.components, default=-1) + 1
+        for _ in new_people:
+            self.components.append(label)
+            label += 1
+            for distances in self.distances:
+                distances.append(UNREACHABLE)
+
+        # Merge components joined by a movie, keeping the lowest label
+        merged = {}
+
+        def find(label):
+            while label in merged:
+                label = merged[label]
+            return label
+
+        for movie in touched:
+            labels = {find(self.components[star])
+                      for star in graph.stars_of(movie)}
+            lowest = min(labels, default=None)
+            for other in labels:
+                if other != lowest:
+                    merged[other] = lowest
+        if merged:
+            for person, label in enumerate(self.components):
+                if label in merged:
+                    self.components[person] = find(label)
+
+        for distances in self.distances:
+            queue = deque()
+            for movie in touched:
+                stars = graph.stars_of(movie)
+                best = min((distances[star] for star in stars),
+                           default=UNREACHABLE)
+                for star in stars:
+                    if distances[star] > best + 1 < UNREACHABLE:
+                        distances[star] = best + 1
+                        queue.append(star)
+            while queue:
+                person = queue.popleft()
+                depth = distances[person] + 1
+                if depth >= UNREACHABLE:
+                    continue
+                for movie in graph.movies_of(person):
+                    for star in graph.stars_of(movie):
+                        if distances[star] > depth:
+                            distances[star] = depth
+                            queue.append(star)
+
+    def save(self, directory):
+        """
+        Writes the index next to the directory's snapshot.
+        """
+        filename = os.path.join(directory, FILENAME)
+        temporary = f"{filename}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(self.landmarks),
+                                len(self.graph.person_ids)))
+            for size, mtime in snapshot.source_signature(directory):
+                f.write(snapshot.SIGNATURE.pack(size, mtime))
+            f.write(array("i", self.landmarks).tobytes())
+            f.write(array("i", self.components).tobytes())
+            for distances in self.distances:
+                f.write(distances)
+        os.replace(temporary, filename)
+
+    def connected(self, source, target):
+        """
+        Returns whether two person numbers are in the same component.
+        """
+        return self.components[source] == self.components[target]
+
+    def lower_bound(self, person, target):
+        """
+        Returns a lower bound on the steps from a person number to the
+        target person number, by the triangle inequality at each landmark.
+        """
+        return self.bound_to(target)(person)
+
+    def bound_to(self, target):
+        """
+        Returns a function giving lower_bound(person, target) for one
+        target, skipping landmarks that cannot reach it.
+        """
+        columns = [(distances, distances[target])
+                   for distances in self.distances
+                   if distances[target] != UNREACHABLE]
+
+        def bound(person):
+            best = 0
+            for distances, b in columns:
+                a = distances[person]
+                if a != UNREACHABLE:
+                    if a - b > best:
+                        best = a - b
+                    elif b - a > best:
+                        best = b - a
+            return best
+        return bound
+
+    def shortest_path(self, source, target, stats=None):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source person_id to the target person_id,
+        found by A* search with landmark lower bounds.
+
+        If no possible path, returns None. If `stats` is a dict, the
+        number of people expanded is counted in stats["expanded"].
+        """
+        graph = self.graph
+        source = graph.person_index[source]
+        target = graph.person_index[target]
+        if not self.connected(source, target):
+            return None
+        steps = self.search(source, target, stats)
+        return [(graph.movie_ids[movie], graph.person_ids[person])
+                for movie, person in steps]
+
+    def search(self, source, target, stats=None):
+        """
+        Returns the shortest list of (movie, person) numbers from source
+        to target by A* search, or None if they are not connected.
+        """
+        graph = self.graph
+        # Best known steps to each person and to each expanded movie,
+        # with the movie each person was reached through and the person
+        # each movie was expanded from
+        cost = {source: 0}
+        movie_cost = {}
+        reached = {source: -1}
+        expanded_by = {}
+
+        # Ties go to the deepest person, then to the earliest added
+        bound = self.bound_to(target)
+        counter = itertools.count()
+        frontier = [(bound(source), 0, 0, source)]
+        while frontier:
+            _, depth, _, person = heapq.heappop(frontier)
+            depth = -depth
+            if depth > cost[person]:
+                continue
+            if person == target:
+                steps = []
+                while reached[person] != -1:
+                    movie = reached[person]
+                    steps.append((movie, person))
+                    person = expanded_by[movie]
+                return steps[::-1]
+            if stats is not None:
+                stats["expanded"] = stats.get("expanded", 0) + 1
+
+            for movie in graph.movies_of(person):
+                if movie_cost.get(movie, depth + 1) <= depth:
+                    continue
+                movie_cost[movie] = depth
+                expanded_by[movie] = person
+                for star in graph.stars_of(movie):
+                    if cost.get(star, depth + 2) <= depth + 1:
+                        continue
+                    cost[star] = depth + 1
+                    reached[star] = movie
+                    heapq.heappush(frontier, (
+                        depth + 1 + bound(star),
+                        -(depth + 1), next(counter), star
+                    ))
+        return None
+
+
+if __name__ == "__main__":
+    main()
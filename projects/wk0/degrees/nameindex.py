@@ -0,0 +1,182 @@
+import heapq
+from bisect import bisect_left, bisect_right
+
+# Largest code point, used to find the end of a run of names by prefix
+LAST = chr(0x10FFFF)
+
+# Runs of names this short are scanned rather than split further
+LEAF = 16
+
+
+class NameIndex():
+    """
+    Lowercase names in sorted order, alongside the person number each
+    belongs to, searched by binary search.
+
+    The sorted names double as an implicit trie: the names sharing a
+    prefix are one contiguous run, so prefix completion is two bisects
+    and bounded edit-distance search walks the runs like trie nodes.
+    People appended to the graph later are kept in a small side table.
+    """
+
+    def __init__(self, keys, order):
+        self.keys = keys
+        self.order = order
+        self.extra = {}
+
+    @classmethod
+    def build(cls, names):
+        """
+        Returns a NameIndex for a names column, sorting it.
+        """
+        order = sorted(range(len(names)), key=lambda i: names[i].lower())
+        return cls([names[i].lower() for i in order], order)
+
+    def add(self, people, names):
+        """
+        Adds person numbers appended after the index was built,
+        with their names looked up in a names column.
+        """
+        for person in people:
+            self.extra.setdefault(names[person].lower(), []).append(person)
+
+    def lookup(self, name):
+        """
+        Returns the person numbers whose name matches, ignoring case.
+        """
+        name = name.lower()
+        lo = bisect_left(self.keys, name)
+        hi = bisect_right(self.keys, name, lo)
+        found = [self.order[i] for i in range(lo, hi)]
+        return found + self.extra.get(name, [])
+
+    def complete(self, prefix, limit=10):
+        """
+        Returns up to `limit` person numbers whose name starts with a
+        prefix, ignoring case, in name order.
+        """
+        prefix = prefix.lower()
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + LAST, lo)
+        found = [self.order[i] for i in range(lo, min(hi, lo + limit))]
+        for name, people in self.extra.items():
+            if name.startswith(prefix):
+                found.extend(people)
+        return found[:limit]
+
+    def fuzzy(self, name, distance=2, limit=10):
+        """
+        Returns up to `limit` (edit distance, person number) pairs for
+        names within an edit distance of a name, ignoring case, closest
+        first.
+        """
+        return self.within(name.lower(), distance, limit)[:limit]
+
+    def within(self, name, distance, limit=None):
+        """
+        Returns sorted (edit distance, person number) pairs for every
+        name within an edit distance of a lowercase name.
+
+        Given a `limit`, the bound tightens to the smallest distance
+        with that many names found within it, since no farther name
+        can be among the closest, so fewer names may be returned.
+        """
+        keys = self.keys
+        found = []
+        # Names found at each distance, to tighten the bound with
+        counts = [0] * (distance + 1)
+        bound = distance
+
+        def add(d, people):
+            nonlocal bound
+            found.extend((d, person) for person in people)
+            counts[d] += len(people)
+            if limit is not None:
+                total = 0
+                for b in range(bound + 1):
+                    total += counts[b]
+                    if total >= limit:
+                        bound = b
+                        break
+
+        # Each trie node is a run [lo, hi) of names sharing a prefix of
+        # the given depth, with the edit distance row for that prefix.
+        # No name below a node is closer than the least entry in its
+        # row, so taking nodes least first finds close names early and
+        # can stop at the first node beyond the bound.
+        heap = [(0, 0, len(self.order), 0, list(range(len(name) + 1)))]
+        while heap:
+            least, lo, hi, depth, row = heapq.heappop(heap)
+            if least > bound:
+                break
+            if hi - lo <= LEAF:
+                for i in range(lo, hi):
+                    d = finish_row(row, name, keys[i], depth, bound)
+                    if d <= bound:
+                        add(d, (self.order[i],))
+                continue
+            i = lo
+            # Names that end exactly at this node sort first
+            while i < hi and len(keys[i]) == depth:
+                if row[-1] <= bound:
+                    add(row[-1], (self.order[i],))
+                i += 1
+            while i < hi:
+                prefix = keys[i][:depth + 1]
+                j = bisect_left(keys, prefix + LAST, i, hi)
+                child = next_row(row, name, prefix[-1], depth, bound)
+                least = min(child)
+                if least <= bound:
+                    heapq.heappush(heap, (least, i, j, depth + 1, child))
+                i = j
+
+        for other, people in self.extra.items():
+            d = edit_distance(name, other)
+            if d <= bound:
+                add(d, people)
+        found = [pair for pair in found if pair[0] <= bound]
+        found.sort()
+        return found
+
+
+def next_row(row, word, c, depth, bound):
+    """
+    Returns the Levenshtein row for a prefix of length `depth` extended
+    by c, given the row for the prefix against word.
+
+    Only cells within `bound` of the diagonal can stay within the bound,
+    so only those are computed, and every cell is capped at bound + 1.
+    """
+    cap = bound + 1
+    i = depth + 1
+    new = [cap] * len(row)
+    new[0] = min(i, cap)
+    for j in range(max(1, i - bound), min(len(word), i + bound) + 1):
+        new[j] = min(new[j - 1] + 1, row[j] + 1,
+                     row[j - 1] + (word[j - 1] != c), cap)
+    return new
+
+
+def finish_row(row, word, other, depth, bound):
+    """
+    Returns the edit distance between word and other, given the row for
+    other's first `depth` characters, or bound + 1 once it must exceed
+    the bound.
+    """
+    for c in other[depth:]:
+        row = next_row(row, word, c, depth, bound)
+        depth += 1
+        if min(row) > bound:
+            return bound + 1
+    return row[-1]
+
+
+def edit_distance(a, b):
+    """
+    Returns the Levenshtein distance between two strings.
+    """
+    bound = max(len(a), len(b))
+    row = list(range(len(a) + 1))
+    for depth, c in enumerate(b):
+        row = next_row(row, a, c, depth, bound)
+    return row[-1]
@@ -0,0 +1,299 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import snapshot
+from graph import NamesView
+
+CACHE_SIZE = 100000
+CHUNK_SIZE = 64
+
+# Graph loaded once per process; workers map the same snapshot file
+graph = None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Answer many degrees of separation queries "
+                    "from one loaded graph."
+    )
+    parser.add_argument("directory", nargs="?", default="large")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--batch", metavar="FILE",
+                      help="read tab-separated source/target pairs "
+                           "from FILE, or - for stdin")
+    mode.add_argument("--serve", metavar="PORT", type=int,
+                      help="answer GET /path?source=...&target=... "
+                           "on localhost:PORT, and /update to apply rows "
+                           "appended to the CSVs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of worker processes")
+    parser.add_argument("--cache", type=int, default=CACHE_SIZE,
+                        help="number of results kept in the LRU cache")
+    args = parser.parse_args()
+
+    print("Loading data...", file=sys.stderr)
+    # Build the snapshot here, so workers only ever memory-map it
+    load(args.directory)
+    print("Data loaded.", file=sys.stderr)
+
+    service = Service(args.directory, args.workers, args.cache)
+    try:
+        if args.batch is not None:
+            if args.batch == "-":
+                run_batch(service, sys.stdin, sys.stdout)
+            else:
+                with open(args.batch, encoding="utf-8") as f:
+                    run_batch(service, f, sys.stdout)
+        else:
+            run_server(service, args.serve)
+    finally:
+        service.close()
+
+
+def load(directory):
+    """
+    Loads the graph for this process.
+    """
+    global graph
+    graph = snapshot.load_graph(directory)
+
+
+def solve(pair):
+    """
+    Returns the shortest path between a (source, target) pair of
+    person_ids, or None if they are not connected.
+    """
+    return graph.shortest_path(*pair)
+
+
+class LRUCache():
+    """
+    Keeps the most recently used `size` results.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key):
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key, value):
+        self.misses += 1
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+
+class Service():
+    """
+    Answers queries from a pool of worker processes,
+    remembering recent answers in an LRU cache.
+    """
+
+    def __init__(self, directory, workers, cache_size):
+        self.directory = directory
+        self.workers = workers
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers, initializer=load, initargs=(directory,)
+        )
+        self.cache = LRUCache(cache_size)
+        # Bumped by each update, so answers from before one are not cached
+        self.generation = 0
+        self.names = NamesView(graph)
+        self.lock = threading.Lock()
+        self.answered = 0
+        self.started = time.perf_counter()
+
+    def close(self):
+        self.pool.shutdown()
+
+    def update(self):
+        """
+        Applies rows appended to the CSVs without reloading the graph,
+        then restarts the workers on the rewritten snapshot and drops
+        cached answers, which the new rows may have shortened.
+
+        Returns counts of the people, movies and movies with new stars.
+        """
+        with self.lock:
+            new_people, new_movies, touched = snapshot.update_graph(
+                self.directory, graph
+            )
+            old = self.pool
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=load,
+                initargs=(self.directory,)
+            )
+            self.cache = LRUCache(self.cache.size)
+            self.generation += 1
+        old.shutdown()
+        return {"people": len(new_people), "movies": len(new_movies),
+                "updated_movies": len(touched)}
+
+    def resolve(self, person):
+        """
+        Returns the person_id for a person_id or an unambiguous name.
+
+        Raises ValueError if there is no such person, or several.
+        """
+        if person in graph.person_index:
+            return person
+        matches = sorted(self.names.get(person.lower(), ()))
+        if not matches:
+            raise ValueError(f"person not found: {person}")
+        if len(matches) > 1:
+            raise ValueError(f"ambiguous name: {person} could be "
+                             + ", ".join(matches))
+        return matches[0]
+
+    def answer(self, queries):
+        """
+        Returns a result dict for each (source, target) query,
+        solving cache misses across the worker pool. Answers solved
+        while an update ran are returned but not cached.
+        """
+        results = [None] * len(queries)
+        pending = {}
+        with self.lock:
+            for i, (source, target) in enumerate(queries):
+                try:
+                    pair = (self.resolve(source), self.resolve(target))
+                except ValueError as e:
+                    results[i] = {"source": source, "target": target,
+                                  "error": str(e)}
+                    continue
+                if pair in self.cache:
+                    results[i] = self.cache.get(pair)
+                elif pair in pending:
+                    # Repeats within one batch are only solved once
+                    self.cache.hits += 1
+                    pending[pair].append(i)
+                else:
+                    pending[pair] = [i]
+            # Submit under the lock so an update cannot retire the pool
+            # before these queries reach it
+            pairs = list(pending)
+            paths = self.pool.map(solve, pairs, chunksize=CHUNK_SIZE)
+            generation = self.generation
+
+        paths = list(paths)
+        with self.lock:
+            for pair, path in zip(pairs, paths):
+                result = {
+                    "source": pair[0],
+                    "target": pair[1],
+                    "degrees": None if path is None else len(path),
+                    "path": path
+                }
+                if self.generation == generation:
+                    self.cache.put(pair, result)
+                else:
+                    self.cache.misses += 1
+                for i in pending[pair]:
+                    results[i] = result
+            self.answered += len(queries)
+        return results
+
+    def stats(self):
+        """
+        Returns query counts, cache hit rate and overall throughput.
+        """
+        with self.lock:
+            elapsed = time.perf_counter() - self.started
+            return {
+                "queries": self.answered,
+                "cache_hits": self.cache.hits,
+                "cache_misses": self.cache.misses,
+                "seconds": elapsed,
+                "queries_per_second": self.answered / elapsed
+            }
+
+
+def run_batch(service, lines, output):
+    """
+    Answers one tab-separated source/target pair per input line,
+    writing one JSON result per output line.
+    """
+    queries = []
+    for line in lines:
+        line = line.rstrip("\n")
+        if not line:
+            continue
+        source, _, target = line.partition("\t")
+        queries.append((source, target))
+
+    start = time.perf_counter()
+    results = service.answer(queries)
+    elapsed = time.perf_counter() - start
+    for result in results:
+        output.write(json.dumps(result) + "\n")
+
+    stats = service.stats()
+    print(f"{len(queries)} queries in {elapsed:.3f} seconds "
+          f"({len(queries) / elapsed if elapsed else 0:.0f} queries/s, "
+          f"{stats['cache_hits']} cache hits)", file=sys.stderr)
+
+
+def run_server(service, port):
+    """
+    Serves queries over HTTP on localhost until interrupted.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            if url.path == "/stats":
+                self.reply(200, service.stats())
+            elif url.path == "/update":
+                try:
+                    self.reply(200, service.update())
+                except ValueError as e:
+                    self.reply(409, {"error": str(e)})
+            elif url.path == "/path" and "source" in query and "target" in query:
+                pair = (query["source"][0], query["target"][0])
+                result = service.answer([pair])[0]
+                self.reply(404 if "error" in result else 200, result)
+            else:
+                self.reply(400, {"error": "use /path?source=...&target=..., "
+                                          "/stats or /update"})
+
+        def reply(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    print(f"Serving on http://127.0.0.1:{port}/", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(service.stats()), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+import csv
+import hashlib
+import io
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+
+from graph import Graph
+from nameindex import NameIndex
+
+# Bump whenever the layout below changes, so old snapshots are rebuilt
+VERSION = 3
+MAGIC = b"DEGREES\0"
+FILENAME = "degrees.snapshot"
+SOURCES = ("people.csv", "movies.csv", "stars.csv")
+
+# Header: magic, version, byte order, section count,
+# then (size, mtime_ns) for each source CSV, then each one's SHA-256
+HEADER = struct.Struct("<8sII4xI")
+SIGNATURE = struct.Struct("<qq")
+DIGEST = struct.Struct("<32s")
+# Each section is stored at an 8-byte aligned offset with its length
+SECTION = struct.Struct("<qq")
+
+# String columns are stored as a UTF-8 blob and an array of offsets
+STRINGS = ("person_ids", "names", "births", "movie_ids", "titles", "years",
+           "name_keys")
+ARRAYS = ("person_offsets", "person_movies", "movie_offsets", "movie_stars",
+          "person_order", "movie_order", "name_order")
+BYTEORDER = 0 if sys.byteorder == "little" else 1
+
+
+def load_graph(directory):
+    """
+    Returns the Graph for a directory of CSVs, reading it from the
+    snapshot next to the CSVs when that is up to date, and otherwise
+    parsing the CSVs and writing a fresh snapshot.
+    """
+    filename = os.path.join(directory, FILENAME)
+    signature = source_signature(directory)
+    try:
+        graph = read_snapshot(filename)
+    except (OSError, ValueError, struct.error):
+        graph = None
+    if graph is not None:
+        if graph.signature == signature:
+            return graph
+        # CSVs that have only had rows appended are patched in
+        try:
+            update_graph(directory, graph)
+            return graph
+        except ValueError:
+            pass
+
+    graph = Graph.from_csv(directory)
+    graph.signature = signature
+    graph.digests = source_digests(directory, signature)
+    try:
+        write_snapshot(graph, filename, signature, graph.digests)
+    except OSError:
+        # A read-only dataset still loads, just without the cache
+        pass
+    return graph
+
+
+def update_graph(directory, graph):
+    """
+    Applies rows appended to a directory's CSVs since a graph was loaded,
+    then rewrites the snapshot to match the CSVs.
+
+    Returns what Graph.apply_rows returns. Raises ValueError, leaving
+    the graph as it was, if any CSV has changed in another way than
+    having rows appended.
+    """
+    digests = getattr(graph, "digests", None)
+    if digests is None:
+        raise ValueError("graph has no digests of its CSVs")
+    signature = source_signature(directory)
+    rows = []
+    new_digests = []
+    for source, old, new, digest in zip(SOURCES, graph.signature,
+                                        signature, digests):
+        if new == old:
+            rows.append([])
+            new_digests.append(digest)
+        elif new[0] > old[0]:
+            appended, digest = read_appended(
+                os.path.join(directory, source), old[0], new[0], digest
+            )
+            rows.append(appended)
+            new_digests.append(digest)
+        else:
+            raise ValueError(f"{source} was rewritten, not appended to")
+
+    people_rows, movies_rows, stars_rows = rows
+    changes = graph.apply_rows(people_rows, movies_rows, stars_rows)
+    graph.signature = signature
+    graph.digests = new_digests
+    try:
+        write_snapshot(graph, os.path.join(directory, FILENAME), signature,
+                       new_digests)
+    except OSError:
+        pass
+    return changes
+
+
+def read_appended(filename, start, end, digest):
+    """
+    Returns the rows of a CSV file between two byte offsets as dicts
+    keyed by the file's header, and the digest of the file up to `end`.
+
+    Raises ValueError unless the bytes before `start` still have the
+    given digest and end a row, and the rows between parse completely.
+    """
+    with open(filename, "rb") as f:
+        before = f.read(start)
+        appended = f.read(end - start)
+    if len(before) != start or len(appended) != end - start:
+        raise ValueError(f"{filename} is shorter than expected")
+    hasher = hashlib.sha256(before)
+    if hasher.digest() != digest:
+        raise ValueError(f"{filename} was edited, not appended to")
+    if not before.endswith(b"\n"):
+        raise ValueError(f"{filename} was appended to mid-row")
+    hasher.update(appended)
+
+    try:
+        header = next(csv.reader([before.split(b"\n", 1)[0].decode("utf-8")]))
+        text = appended.decode("utf-8")
+        rows = list(csv.DictReader(io.StringIO(text), fieldnames=header))
+    except (UnicodeDecodeError, csv.Error, StopIteration) as error:
+        raise ValueError(f"{filename} has unreadable rows: {error}")
+    for row in rows:
+        # Short rows leave fields as None, which cannot be stored
+        if any(value is None for value in row.values()):
+            raise ValueError(f"{filename} has a row with missing fields")
+    return rows, hasher.digest()
+
+
+def source_signature(directory):
+    """
+    Returns the (size, mtime_ns) of each source CSV in a directory.
+    """
+    signature = []
+    for source in SOURCES:
+        stat = os.stat(os.path.join(directory, source))
+        signature.append((stat.st_size, stat.st_mtime_ns))
+    return signature
+
+
+def source_digests(directory, signature):
+    """
+    Returns the SHA-256 digest of each source CSV in a directory, up
+    to the size in its signature.
+    """
+    digests = []
+    for source, (size, _) in zip(SOURCES, signature):
+        with open(os.path.join(directory, source), "rb") as f:
+            digests.append(hashlib.sha256(f.read(size)).digest())
+    return digests
+
+
+def write_snapshot(graph, filename, signature, digests):
+    """
+    Writes a graph to a snapshot file, replacing any older snapshot.
+    """
+    index = graph.name_index()
+    if index.extra:
+        # Sort people appended since the index was built in with the rest
+        index = NameIndex.build(graph.names)
+
+    sections = []
+    for name in STRINGS:
+        if name == "name_keys":
+            column = index.keys
+        else:
+            column = getattr(graph, name)
+        blob, offsets = encode_strings(column)
+        sections.extend([blob, offsets.tobytes()])
+    arrays = list(graph.csr())
+    arrays.append(sorted_order(graph.person_ids))
+    arrays.append(sorted_order(graph.movie_ids))
+    arrays.append(index.order)
+    for values in arrays:
+        sections.append(array("i", values).tobytes())
+
+    # Lay sections out after the header and section table
+    position = (HEADER.size + (SIGNATURE.size + DIGEST.size) * len(SOURCES)
+                + SECTION.size * len(sections))
+    table = []
+    for section in sections:
+        position = align(position)
+        table.append((position, len(section)))
+        position += len(section)
+
+    temporary = f"{filename}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, BYTEORDER, len(sections)))
+        for size, mtime in signature:
+            f.write(SIGNATURE.pack(size, mtime))
+        for digest in digests:
+            f.write(DIGEST.pack(digest))
+        for offset, length in table:
+            f.write(SECTION.pack(offset, length))
+        for (offset, _), section in zip(table, sections):
+            f.write(bytes(offset - f.tell()))
+            f.write(section)
+    os.replace(temporary, filename)
+
+
+def read_snapshot(filename):
+    """
+    Returns the Graph stored in a snapshot file, memory-mapped so that
+    nothing is decoded until it is used. The graph's `signature` and
+    `digests` are those of the CSVs the snapshot was written for.
+
+    Raises ValueError if the snapshot is from another version, or is
+    truncated or inconsistent.
+    """
+    with open(filename, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(buffer)
+
+    if len(view) < HEADER.size:
+        raise ValueError("snapshot is truncated")
+    magic, version, byteorder, count = HEADER.unpack_from(view, 0)
+    if (magic, version, byteorder) != (MAGIC, VERSION, BYTEORDER):
+        raise ValueError("snapshot from another version")
+    if count != 2 * len(STRINGS) + len(ARRAYS):
+        raise ValueError("snapshot has the wrong sections")
+    if len(view) < (HEADER.size + (SIGNATURE.size + DIGEST.size)
+                    * len(SOURCES) + SECTION.size * count):
+        raise ValueError("snapshot is truncated")
+    position = HEADER.size
+    signature = []
+    for _ in SOURCES:
+        signature.append(SIGNATURE.unpack_from(view, position))
+        position += SIGNATURE.size
+    digests = []
+    for _ in SOURCES:
+        digests.append(DIGEST.unpack_from(view, position)[0])
+        position += DIGEST.size
+    sections = []
+    for _ in range(count):
+        offset, length = SECTION.unpack_from(view, position)
+        if not (position + SECTION.size <= offset
+                and 0 <= length <= len(view) - offset):
+            raise ValueError("snapshot section out of bounds")
+        sections.append(view[offset:offset + length])
+        position += SECTION.size
+
+    columns = {}
+    for i, name in enumerate(STRINGS):
+        blob, offsets = sections[2 * i], sections[2 * i + 1]
+        if len(offsets) % 8 or not len(offsets):
+            raise ValueError(f"snapshot has broken {name} offsets")
+        offsets = offsets.cast("q")
+        # Offsets must run in order from the start to the end of the blob
+        values = offsets.tolist()
+        if (values[0] != 0 or values[-1] != len(blob)
+                or sorted(values) != values):
+            raise ValueError(f"snapshot has broken {name} offsets")
+        columns[name] = StringTable(blob, offsets)
+    for i, name in enumerate(ARRAYS):
+        section = sections[2 * len(STRINGS) + i]
+        if len(section) % 4:
+            raise ValueError(f"snapshot has a broken {name} array")
+        columns[name] = section.cast("i")
+
+    people = len(columns["person_ids"])
+    movies = len(columns["movie_ids"])
+    lengths = {
+        "names": people, "births": people, "titles": movies,
+        "years": movies, "person_offsets": people + 1,
+        "movie_offsets": movies + 1, "person_order": people,
+        "movie_order": movies, "name_order": len(columns["name_keys"])
+    }
+    for name, length in lengths.items():
+        if len(columns[name]) != length:
+            raise ValueError(f"snapshot has the wrong number of {name}")
+    if (columns["person_offsets"][-1] != len(columns["person_movies"])
+            or columns["movie_offsets"][-1] != len(columns["movie_stars"])):
+        raise ValueError("snapshot adjacency does not match its offsets")
+
+    graph = Graph(
+        *(columns[name] for name in STRINGS[:6]),
+        *(columns[name] for name in ARRAYS[:4]),
+        person_index=SortedIndex(columns["person_ids"],
+                                 columns["person_order"]),
+        movie_index=SortedIndex(columns["movie_ids"],
+                                columns["movie_order"]),
+        name_order=(columns["name_keys"], columns["name_order"]),
+    )
+    graph.signature = signature
+    graph.digests = digests
+    # Keep the mapping open for as long as the graph is alive
+    graph.buffer = buffer
+    return graph
+
+
+def encode_strings(strings):
+    """
+    Returns a UTF-8 blob of strings and an array of their offsets
+    into it, with one extra offset marking the end of the blob.
+    """
+    encoded = [string.encode("utf-8") for string in strings]
+    offsets = array("q", [0])
+    for string in encoded:
+        offsets.append(offsets[-1] + len(string))
+    return b"".join(encoded), offsets
+
+
+def sorted_order(strings):
+    """
+    Returns the positions of strings in sorted string order.
+    """
+    return sorted(range(len(strings)), key=strings.__getitem__)
+
+
+def align(position):
+    """
+    Rounds a file position up to the next multiple of 8 bytes.
+    """
+    return (position + 7) // 8 * 8
+
+
+class StringTable():
+    """
+    Read-only sequence of strings decoded on demand from a UTF-8 blob.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("string index out of range")
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+
+class SortedIndex():
+    """
+    Maps strings in a StringTable to their positions by binary search
+    over a precomputed sorted order, without building a dict.
+    """
+
+    def __init__(self, strings, order):
+        self.strings = strings
+        self.order = order
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, string):
+        i = bisect_left(self.order, string, key=self.strings.__getitem__)
+        if i < len(self.order) and self.strings[self.order[i]] == string:
+            return self.order[i]
+        raise KeyError(string)
+
+    def __contains__(self, string):
+        try:
+            self[string]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, string, default=None):
+        try:
+            return self[string]
+        except KeyError:
+            return default
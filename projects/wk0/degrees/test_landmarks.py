@@ -0,0 +1,42 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import landmarks
+import snapshot
+
+SMALL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "small")
+
+
+class LoadIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for source in snapshot.SOURCES:
+            shutil.copy(os.path.join(SMALL, source), self.directory)
+        self.graph = snapshot.load_graph(self.directory)
+        landmarks.build_index(self.directory, workers=1,
+                              graph=self.graph).save(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_saved_index_loads(self):
+        index = landmarks.load_index(self.directory, self.graph)
+        self.assertIsNotNone(index)
+        self.assertEqual(index.lower_bound(0, 0), 0)
+
+    def test_truncated_index(self):
+        filename = os.path.join(self.directory, landmarks.FILENAME)
+        with open(filename, "rb") as f:
+            data = f.read()
+        for size in range(len(data)):
+            with open(filename, "wb") as f:
+                f.write(data[:size])
+            self.assertIsNone(landmarks.load_index(self.directory,
+                                                   self.graph))
+
+
+if __name__ == "__main__":
+    unittest.main()
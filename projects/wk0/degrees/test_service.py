@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import service
+import snapshot
+
+SMALL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "small")
+
+# Kevin Bacon and Dustin Hoffman, two degrees apart until a stars row
+# puts Dustin Hoffman in Apollo 13
+PAIR = ("102", "163")
+STAR = "163,112384\n"
+
+
+class UpdatingPool():
+    """
+    Stands in for the worker pool: solves on the graph as it is when
+    the queries are submitted, then runs an update before the answers
+    are collected.
+    """
+
+    def __init__(self, service, pool):
+        self.service = service
+        self.pool = pool
+
+    def map(self, function, pairs, chunksize=1):
+        paths = [function(pair) for pair in pairs]
+
+        def collect():
+            self.service.update()
+            yield from paths
+        return collect()
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+
+class ServiceUpdateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for source in snapshot.SOURCES:
+            shutil.copy(os.path.join(SMALL, source), self.directory)
+        service.load(self.directory)
+        self.service = service.Service(self.directory, 1, 100)
+
+    def tearDown(self):
+        self.service.close()
+        shutil.rmtree(self.directory)
+
+    def test_update_between_submit_and_collect(self):
+        with open(os.path.join(self.directory, "stars.csv"), "a",
+                  encoding="utf-8") as f:
+            f.write(STAR)
+        self.service.pool = UpdatingPool(self.service, self.service.pool)
+
+        # The answer solved before the update is returned, not cached
+        result = self.service.answer([PAIR])[0]
+        self.assertEqual(result["degrees"], 2)
+        self.assertNotIn(PAIR, self.service.cache)
+
+        result = self.service.answer([PAIR])[0]
+        self.assertEqual(result["degrees"], 1)
+        self.assertIn(PAIR, self.service.cache)
+
+
+if __name__ == "__main__":
+    unittest.main()
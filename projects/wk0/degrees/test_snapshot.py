@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import snapshot
+from graph import Graph
+
+SMALL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "small")
+
+
+def contents(graph):
+    """
+    Returns a graph's people, movies and stars as comparable sets.
+    """
+    people = {(graph.person_ids[p], graph.names[p], graph.births[p])
+              for p in range(len(graph.person_ids))}
+    movies = {(graph.movie_ids[m], graph.titles[m], graph.years[m])
+              for m in range(len(graph.movie_ids))}
+    stars = {(graph.person_ids[p], graph.movie_ids[m])
+             for p in range(len(graph.person_ids))
+             for m in graph.movies_of(p)}
+    return people, movies, stars
+
+
+class SnapshotUpdateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for source in snapshot.SOURCES:
+            shutil.copy(os.path.join(SMALL, source), self.directory)
+        snapshot.load_graph(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def rewrite(self, source, old, new):
+        """
+        Replaces text in a CSV, moving its mtime on so the change is seen.
+        """
+        filename = os.path.join(self.directory, source)
+        with open(filename, encoding="utf-8") as f:
+            text = f.read()
+        self.assertIn(old, text)
+        stat = os.stat(filename)
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write(text.replace(old, new, 1))
+        os.utime(filename, ns=(stat.st_atime_ns,
+                               stat.st_mtime_ns + 1_000_000_000))
+
+    def assertFresh(self):
+        """
+        Checks that loading now gives the same graph as parsing the CSVs,
+        both straight away and from the snapshot written on the way.
+        """
+        fresh = contents(Graph.from_csv(self.directory))
+        self.assertEqual(contents(snapshot.load_graph(self.directory)), fresh)
+        self.assertEqual(contents(snapshot.load_graph(self.directory)), fresh)
+
+    def test_appended_rows(self):
+        with open(os.path.join(self.directory, "people.csv"), "a",
+                  encoding="utf-8") as f:
+            f.write('999,"New Person",2000\n')
+        self.assertFresh()
+
+    def test_row_edited_in_place(self):
+        self.rewrite("people.csv", '"Tom Cruise"', '"Tom Cruise Jr."')
+        self.assertFresh()
+
+    def test_row_inserted_mid_file(self):
+        self.rewrite("people.csv", '129,"Tom Cruise",1962\n',
+                     '129,"Tom Cruise",1962\n999,"Tom Cruise",1962\n')
+        self.assertFresh()
+
+    def test_update_graph_rejects_edits(self):
+        graph = snapshot.load_graph(self.directory)
+        before = contents(graph)
+        self.rewrite("people.csv", '"Tom Cruise"', '"Tom Cruise Jr."')
+        with self.assertRaises(ValueError):
+            snapshot.update_graph(self.directory, graph)
+        self.assertEqual(contents(graph), before)
+
+    def test_truncated_snapshot(self):
+        filename = os.path.join(self.directory, snapshot.FILENAME)
+        with open(filename, "rb") as f:
+            data = f.read()
+        for size in range(0, len(data), 16):
+            with open(filename, "wb") as f:
+                f.write(data[:size])
+            with self.assertRaises(ValueError):
+                snapshot.read_snapshot(filename)
+            self.assertFresh()
+
+
+if __name__ == "__main__":
+    unittest.main()
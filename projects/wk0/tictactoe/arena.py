@@ -0,0 +1,250 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import mcts
+import mnk
+import tictactoe as ttt
+from bitboard import Bitboard
+from book import load_book
+
+ENGINES = ("minimax", "random", "mcts", "book", "alphabeta")
+GAMES = 100
+PLAYOUTS = 500
+BUDGET = 0.05
+PERCENTILES = (50, 90, 99)
+
+# Settings, opening book and engines for each worker process
+settings = None
+book = None
+engines = {}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play tic-tac-toe engines against each other "
+                    "without a display."
+    )
+    parser.add_argument("engines", nargs="*", default=list(ENGINES),
+                        help=f"engines to play, from {', '.join(ENGINES)}")
+    parser.add_argument("--games", type=int, default=GAMES,
+                        help="games per pairing of engines and sides")
+    parser.add_argument("--playouts", type=int, default=PLAYOUTS,
+                        help="playouts per move for mcts")
+    parser.add_argument("--budget", type=float, default=BUDGET,
+                        help="seconds per move for alphabeta")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of worker processes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", metavar="FILE",
+                        help="write a summary per engine to FILE")
+    parser.add_argument("--csv", metavar="FILE",
+                        help="write one row per game to FILE")
+    args = parser.parse_args()
+    for name in args.engines:
+        if name not in ENGINES:
+            sys.exit(f"Unknown engine: {name}")
+
+    # Every engine plays every other engine, and itself, from both sides
+    tasks = []
+    for x, o in itertools.product(args.engines, repeat=2):
+        for _ in range(args.games):
+            tasks.append((len(tasks), x, o, args.seed + len(tasks)))
+    options = {"playouts": args.playouts, "budget": args.budget}
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=load,
+                             initargs=(options,)) as pool:
+        games = list(pool.map(play, tasks, chunksize=8))
+    elapsed = time.perf_counter() - start
+    print(f"{len(games)} games in {elapsed:.3f} seconds.", file=sys.stderr)
+
+    summary = summarize(games)
+    print_summary(summary)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "seconds": elapsed,
+                       "engines": summary}, f, indent=2)
+    if args.csv:
+        write_games(games, args.csv)
+
+
+def load(options):
+    """
+    Sets up a worker process: minimax always searches, and the opening
+    book is read once.
+    """
+    global settings, book
+    settings = options
+    book = load_book()
+    ttt.book = None
+    ttt.PLAYER = "minimax"
+
+
+def engine(side, name):
+    """
+    Returns a function from a board to an (action, nodes) pair for an
+    engine playing one side, created on first use in each game. Each
+    side has its own engine, so in self-play neither reuses the other's
+    trees or tables.
+    """
+    if (side, name) in engines:
+        return engines[(side, name)]
+    if name == "minimax":
+        table = {}
+
+        def choose(board):
+            # Minimax keeps its table in the module, so point it at
+            # this side's own before searching
+            ttt.table = table
+            stats = {}
+            return ttt.minimax(board, stats), stats.get("nodes", 0)
+    elif name == "random":
+        def choose(board):
+            return random.choice(sorted(ttt.actions(board))), 0
+    elif name == "mcts":
+        player = mcts.MCTS(mnk.Game(), iterations=settings["playouts"])
+
+        def choose(board):
+            cell = player.choose(mnk.Board.from_board(board))
+            return divmod(cell, 3), player.iterations
+    elif name == "book":
+        if book is None:
+            raise ValueError("no book: run book.py first")
+
+        def choose(board):
+            cell, _ = book.lookup(Bitboard.from_board(board))
+            return divmod(cell, 3), 1
+    elif name == "alphabeta":
+        player = mnk.Engine(mnk.Game(), settings["budget"])
+
+        def choose(board):
+            cell = player.choose(mnk.Board.from_board(board))
+            return divmod(cell, 3), player.nodes
+    engines[(side, name)] = choose
+    return choose
+
+
+def play(task):
+    """
+    Plays one game and returns its record.
+    """
+    number, x, o, seed = task
+    random.seed(seed)
+    # Every game starts from empty tables and trees, so its nodes and
+    # times do not depend on which games the worker played before
+    engines.clear()
+    players = {ttt.X: x, ttt.O: o}
+    moves = {ttt.X: [], ttt.O: []}
+    board = ttt.initial_state()
+    while not ttt.terminal(board):
+        turn = ttt.player(board)
+        choose = engine(turn, players[turn])
+        start = time.perf_counter()
+        action, nodes = choose(board)
+        seconds = time.perf_counter() - start
+        moves[turn].append((seconds, nodes))
+        board = ttt.result(board, action)
+    return {
+        "game": number,
+        "x": x,
+        "o": o,
+        "winner": ttt.winner(board),
+        "x_moves": moves[ttt.X],
+        "o_moves": moves[ttt.O]
+    }
+
+
+def percentile(values, p):
+    """
+    Returns the p-th percentile of sorted values by nearest rank.
+    """
+    if not values:
+        return None
+    rank = max(1, -(-len(values) * p // 100))
+    return values[rank - 1]
+
+
+def summarize(games):
+    """
+    Returns win, draw and loss rates, move latency percentiles and
+    nodes searched per move for each engine.
+    """
+    totals = {}
+    for game in games:
+        for side, name in ((ttt.X, game["x"]), (ttt.O, game["o"])):
+            total = totals.setdefault(name, {
+                "games": 0, "wins": 0, "draws": 0, "losses": 0,
+                "seconds": [], "nodes": 0
+            })
+            total["games"] += 1
+            if game["winner"] is None:
+                total["draws"] += 1
+            elif game["winner"] == side:
+                total["wins"] += 1
+            else:
+                total["losses"] += 1
+            for seconds, nodes in game[f"{side.lower()}_moves"]:
+                total["seconds"].append(seconds)
+                total["nodes"] += nodes
+
+    summary = {}
+    for name, total in totals.items():
+        seconds = sorted(total["seconds"])
+        moves = len(seconds)
+        summary[name] = {
+            "games": total["games"],
+            "win_rate": total["wins"] / total["games"],
+            "draw_rate": total["draws"] / total["games"],
+            "loss_rate": total["losses"] / total["games"],
+            "moves": moves,
+            "nodes_per_move": total["nodes"] / moves if moves else 0,
+            "latency_ms": {
+                f"p{p}": 1000 * percentile(seconds, p) for p in PERCENTILES
+            }
+        }
+        summary[name]["latency_ms"]["max"] = 1000 * seconds[-1]
+    return summary
+
+
+def print_summary(summary):
+    """
+    Prints one line of results per engine.
+    """
+    print(f"{'engine':<10}{'games':>7}{'win':>7}{'draw':>7}{'loss':>7}"
+          f"{'p50 ms':>9}{'p99 ms':>9}{'nodes':>10}")
+    for name, result in summary.items():
+        print(f"{name:<10}{result['games']:>7}{result['win_rate']:>7.2f}"
+              f"{result['draw_rate']:>7.2f}{result['loss_rate']:>7.2f}"
+              f"{result['latency_ms']['p50']:>9.3f}"
+              f"{result['latency_ms']['p99']:>9.3f}"
+              f"{result['nodes_per_move']:>10.1f}")
+
+
+def write_games(games, filename):
+    """
+    Writes one row per game with each side's time and nodes searched.
+    """
+    with open(filename, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["game", "x", "o", "winner", "moves",
+                         "x_seconds", "o_seconds", "x_nodes", "o_nodes"])
+        for game in games:
+            writer.writerow([
+                game["game"], game["x"], game["o"], game["winner"] or "",
+                len(game["x_moves"]) + len(game["o_moves"]),
+                sum(seconds for seconds, _ in game["x_moves"]),
+                sum(seconds for seconds, _ in game["o_moves"]),
+                sum(nodes for _, nodes in game["x_moves"]),
+                sum(nodes for _, nodes in game["o_moves"])
+            ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import argparse
+import math
+import os
+import time
+
+import mnk
+import tictactoe as ttt
+from bitboard import Bitboard
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare search speed on list boards and bitboards, "
+                    "and of serial and parallel search."
+    )
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="number of times to time each search")
+    parser.add_argument("--board", type=int, nargs=3, default=[7, 7, 4],
+                        metavar=("M", "N", "K"),
+                        help="m,n,k-game for the parallel search")
+    parser.add_argument("--depth", type=int, default=5,
+                        help="moves ahead for the parallel search")
+    parser.add_argument("--cores", type=int, nargs="+", default=[1, 2, 4],
+                        help="worker counts for the parallel search")
+    args = parser.parse_args()
+    compare_boards(args.repeat)
+    compare_parallel(mnk.Game(*args.board), args.depth, args.cores)
+
+
+def compare_boards(repeat):
+    """
+    Prints the speed of searching list boards and bitboards.
+    """
+    # Full alpha-beta from the empty board without the transposition
+    # table, so both searches visit exactly the same nodes
+    searches = [
+        ("lists", lambda: list_search(ttt.initial_state(),
+                                      -math.inf, math.inf)),
+        ("bitboard", lambda: bitboard_search(Bitboard(),
+                                             -math.inf, math.inf)),
+    ]
+    rates = {}
+    print(f"{'search':<10}{'value':>6}{'nodes':>10}{'seconds':>10}"
+          f"{'nodes/s':>12}")
+    for name, search in searches:
+        best = math.inf
+        for _ in range(repeat):
+            start = time.perf_counter()
+            value, nodes = search()
+            best = min(best, time.perf_counter() - start)
+        rates[name] = nodes / best
+        print(f"{name:<10}{value:>6}{nodes:>10}{best:>10.3f}"
+              f"{rates[name]:>12.0f}")
+    print(f"Speedup: {rates['bitboard'] / rates['lists']:.1f}x")
+
+
+def compare_parallel(game, depth, cores):
+    """
+    Prints the time to choose a first move on an empty m,n,k board by
+    serial search and by root-split search with each number of cores,
+    checking that every search chooses the same move.
+    """
+    print()
+    print(f"{game.m},{game.n},{game.k}-game to depth {depth}, "
+          f"{os.cpu_count()} CPUs available")
+    print(f"{'cores':<10}{'move':>8}{'value':>8}{'nodes':>10}"
+          f"{'seconds':>10}{'speedup':>10}")
+    engine = mnk.Engine(game, math.inf, limit=depth)
+    start = time.perf_counter()
+    move = engine.choose(mnk.Board(game))
+    serial = time.perf_counter() - start
+    print(f"{'serial':<10}{str(game.position(move)):>8}{engine.value:>8}"
+          f"{engine.nodes:>10}{serial:>10.3f}{1:>10.2f}")
+    for count in cores:
+        engine = mnk.ParallelEngine(game, math.inf, limit=depth,
+                                    workers=count)
+        try:
+            start = time.perf_counter()
+            chosen = engine.choose(mnk.Board(game))
+            elapsed = time.perf_counter() - start
+        finally:
+            engine.close()
+        if chosen != move:
+            print(f"Parallel search with {count} cores chose "
+                  f"{game.position(chosen)}, not {game.position(move)}")
+        print(f"{count:<10}{str(game.position(chosen)):>8}{engine.value:>8}"
+              f"{engine.nodes:>10}{elapsed:>10.3f}{serial / elapsed:>10.2f}")
+    if max(cores) > os.cpu_count():
+        print("Speedups with more cores than CPUs show only overhead.")
+
+
+def list_search(board, alpha, beta):
+    """
+    Returns the value of a board and the number of nodes searched,
+    using the list of lists functions.
+    """
+    if ttt.terminal(board):
+        return ttt.utility(board), 1
+    nodes = 1
+    maximizing = ttt.player(board) == ttt.X
+    v = -math.inf if maximizing else math.inf
+    for action in sorted(ttt.actions(board)):
+        value, count = list_search(ttt.result(board, action), alpha, beta)
+        nodes += count
+        if maximizing:
+            v = max(v, value)
+            alpha = max(alpha, v)
+        else:
+            v = min(v, value)
+            beta = min(beta, v)
+        if alpha >= beta:
+            break
+    return v, nodes
+
+
+def bitboard_search(bitboard, alpha, beta):
+    """
+    Returns the value of a bitboard and the number of nodes searched,
+    making and unmaking moves in place.
+    """
+    if bitboard.terminal():
+        return bitboard.utility(), 1
+    nodes = 1
+    maximizing = bitboard.turn() == ttt.X
+    v = -math.inf if maximizing else math.inf
+    for cell in bitboard.cells():
+        bitboard.make(cell)
+        value, count = bitboard_search(bitboard, alpha, beta)
+        bitboard.unmake()
+        nodes += count
+        if maximizing:
+            v = max(v, value)
+            alpha = max(alpha, v)
+        else:
+            v = min(v, value)
+            beta = min(beta, v)
+        if alpha >= beta:
+            break
+    return v, nodes
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Tic Tac Toe bitboards
+"""
+
+X = "X"
+O = "O"
+EMPTY = None
+
+# Cell (i, j) is bit 3 * i + j of a mask
+FULL = 0b111111111
+
+# Winning lines as masks of their three cells
+LINES = [
+    # Horizontals
+    0b000000111,
+    0b000111000,
+    0b111000000,
+    # Verticals
+    0b001001001,
+    0b010010010,
+    0b100100100,
+    # Diagonals
+    0b100010001,
+    0b001010100
+]
+
+# Flattened cell order of the board under each of its 8 rotations and
+# reflections
+SYMMETRIES = [
+    (0, 1, 2, 3, 4, 5, 6, 7, 8),
+    (6, 3, 0, 7, 4, 1, 8, 5, 2),
+    (8, 7, 6, 5, 4, 3, 2, 1, 0),
+    (2, 5, 8, 1, 4, 7, 0, 3, 6),
+    (2, 1, 0, 5, 4, 3, 8, 7, 6),
+    (6, 7, 8, 3, 4, 5, 0, 1, 2),
+    (0, 3, 6, 1, 4, 7, 2, 5, 8),
+    (8, 5, 2, 7, 4, 1, 6, 3, 0)
+]
+
+
+def transform(mask, symmetry):
+    """
+    Returns a mask with its cells moved by one of the SYMMETRIES.
+    """
+    moved = 0
+    for cell, source in enumerate(symmetry):
+        if mask >> source & 1:
+            moved |= 1 << cell
+    return moved
+
+
+# Every mask under every symmetry, looked up rather than recomputed
+TRANSFORMS = [[transform(mask, symmetry) for mask in range(FULL + 1)]
+              for symmetry in SYMMETRIES]
+
+
+def won(mask):
+    """
+    Returns True if a player's mask covers a winning line.
+    """
+    for line in LINES:
+        if mask & line == line:
+            return True
+    return False
+
+
+class Bitboard():
+    """
+    Board kept as one mask of cells for X and one for O,
+    changed in place by making and unmaking moves.
+    """
+
+    def __init__(self, x=0, o=0):
+        self.x = x
+        self.o = o
+        self.moves = []
+
+    @classmethod
+    def from_board(cls, board):
+        """
+        Returns the Bitboard for a list of lists board.
+        """
+        x = o = 0
+        for i, row in enumerate(board):
+            for j, cell in enumerate(row):
+                if cell == X:
+                    x |= 1 << (3 * i + j)
+                elif cell == O:
+                    o |= 1 << (3 * i + j)
+        return cls(x, o)
+
+    def to_board(self):
+        """
+        Returns the list of lists board for this Bitboard.
+        """
+        board = [[EMPTY] * 3 for _ in range(3)]
+        for cell in range(9):
+            if self.x >> cell & 1:
+                board[cell // 3][cell % 3] = X
+            elif self.o >> cell & 1:
+                board[cell // 3][cell % 3] = O
+        return board
+
+    def turn(self):
+        """
+        Returns the player to move, ignoring whether the game is over.
+        """
+        if self.x.bit_count() > self.o.bit_count():
+            return O
+        return X
+
+    def empty(self):
+        """
+        Returns the mask of empty cells.
+        """
+        return FULL & ~(self.x | self.o)
+
+    def cells(self):
+        """
+        Returns the empty cell numbers, in order.
+        """
+        free = self.empty()
+        return [cell for cell in range(9) if free >> cell & 1]
+
+    def winner(self):
+        """
+        Returns the winner of the game, if there is one.
+        """
+        if won(self.x):
+            return X
+        if won(self.o):
+            return O
+        return None
+
+    def terminal(self):
+        """
+        Returns True if game is over, False otherwise.
+        """
+        return (self.x | self.o) == FULL or won(self.x) or won(self.o)
+
+    def utility(self):
+        """
+        Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
+        """
+        if won(self.x):
+            return 1
+        if won(self.o):
+            return -1
+        return 0
+
+    def make(self, cell):
+        """
+        Plays the player to move into an empty cell number.
+        """
+        if self.turn() == X:
+            self.x |= 1 << cell
+        else:
+            self.o |= 1 << cell
+        self.moves.append(cell)
+
+    def unmake(self):
+        """
+        Takes back the last move made.
+        """
+        cell = self.moves.pop()
+        self.x &= ~(1 << cell)
+        self.o &= ~(1 << cell)
+
+    def canonical(self):
+        """
+        Returns (key, symmetry), where symmetry is the index of one of
+        the SYMMETRIES that turns this board into the board for the key.
+        """
+        return min(((transform[self.x] << 9) | transform[self.o], symmetry)
+                   for symmetry, transform in enumerate(TRANSFORMS))
+
+    def key(self):
+        """
+        Returns the same key for a board and all its rotations and
+        reflections.
+        """
+        return min((transform[self.x] << 9) | transform[self.o]
+                   for transform in TRANSFORMS)
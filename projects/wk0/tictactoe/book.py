@@ -0,0 +1,186 @@
+import argparse
+import os
+import struct
+import sys
+import time
+from array import array
+
+from bitboard import SYMMETRIES, X, Bitboard
+
+# Bump whenever the layout below changes, so old books are ignored
+VERSION = 1
+MAGIC = b"TTTBOOK\0"
+FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        "tictactoe.book")
+
+# Header: magic, version, entry count, then one 32-bit entry per
+# position, sorted by canonical key: the key in the high bits, then the
+# best cell in 4 bits, then the value plus one in 2 bits
+HEADER = struct.Struct("<8sII")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Solve every reachable tic-tac-toe position "
+                    "and write the best moves to a book."
+    )
+    parser.add_argument("--output", default=FILENAME,
+                        help="file to write the book to")
+    parser.add_argument("--verify", action="store_true",
+                        help="check an existing book against the live "
+                             "search instead of writing one")
+    args = parser.parse_args()
+
+    if args.verify:
+        book = load_book(args.output)
+        if book is None:
+            sys.exit(f"No book at {args.output}")
+        positions, errors = verify(book)
+        print(f"Checked {positions} positions: {errors} errors.")
+        sys.exit(1 if errors else 0)
+
+    start = time.perf_counter()
+    entries = {}
+    solve(Bitboard(), entries)
+    write_book(entries, args.output)
+    print(f"Solved {len(entries)} positions in "
+          f"{time.perf_counter() - start:.3f} seconds.")
+
+
+def solve(bitboard, entries):
+    """
+    Returns the value of a position, adding the best move and value
+    of it and every position reachable from it to `entries`, keyed by
+    canonical key with the move in the canonical board's cells.
+    """
+    if bitboard.terminal():
+        return bitboard.utility()
+    key, symmetry = bitboard.canonical()
+    if key in entries:
+        return entries[key][1]
+
+    maximizing = bitboard.turn() == X
+    best = None
+    for cell in bitboard.cells():
+        bitboard.make(cell)
+        value = solve(bitboard, entries)
+        bitboard.unmake()
+        if best is None or (value > best[1] if maximizing
+                            else value < best[1]):
+            best = (cell, value)
+    cell, value = best
+    entries[key] = (SYMMETRIES[symmetry].index(cell), value)
+    return value
+
+
+def write_book(entries, filename):
+    """
+    Writes solved positions to a book file, replacing any older book.
+    """
+    packed = array("I", sorted(key << 6 | cell << 2 | value + 1
+                               for key, (cell, value) in entries.items()))
+    if sys.byteorder == "big":
+        packed.byteswap()
+    temporary = f"{filename}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(packed)))
+        f.write(packed.tobytes())
+    os.replace(temporary, filename)
+
+
+def load_book(filename=FILENAME):
+    """
+    Returns the Book stored in a file, or None if there is none
+    or it is from another version.
+    """
+    try:
+        with open(filename, "rb") as f:
+            data = f.read()
+        magic, version, count = HEADER.unpack_from(data, 0)
+    except (OSError, struct.error):
+        return None
+    if (magic, version) != (MAGIC, VERSION):
+        return None
+    packed = array("I", data[HEADER.size:HEADER.size + 4 * count])
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return Book({entry >> 6: ((entry >> 2) & 0xF, (entry & 0x3) - 1)
+                 for entry in packed})
+
+
+class Book():
+    """
+    Best move and value of every reachable position, by canonical key.
+    """
+
+    def __init__(self, entries):
+        self.entries = entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, bitboard):
+        """
+        Returns (cell, value) for a position, with the cell on the
+        board as given, or None if the position is not in the book.
+        """
+        key, symmetry = bitboard.canonical()
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        cell, value = entry
+        return SYMMETRIES[symmetry][cell], value
+
+
+def verify(book):
+    """
+    Returns the number of reachable positions checked and the number
+    where the book disagrees with the live minimax search: either its
+    move or its value differs in value from the search's move.
+    """
+    import tictactoe as ttt
+    saved, ttt.book = ttt.book, None
+    try:
+        values = {}
+        solve(Bitboard(), values)
+
+        def value(bitboard):
+            if bitboard.terminal():
+                return bitboard.utility()
+            return values[bitboard.key()][1]
+
+        positions = errors = 0
+        seen = set()
+        stack = [Bitboard()]
+        while stack:
+            bitboard = stack.pop()
+            if (bitboard.x, bitboard.o) in seen or bitboard.terminal():
+                continue
+            seen.add((bitboard.x, bitboard.o))
+            positions += 1
+
+            i, j = ttt.minimax(bitboard.to_board())
+            bitboard.make(3 * i + j)
+            live = value(bitboard)
+            bitboard.unmake()
+            cell, stored = book.lookup(bitboard)
+            if not bitboard.empty() >> cell & 1:
+                errors += 1
+                continue
+            bitboard.make(cell)
+            chosen = value(bitboard)
+            bitboard.unmake()
+            if not stored == live == chosen:
+                errors += 1
+
+            for cell in bitboard.cells():
+                child = Bitboard(bitboard.x, bitboard.o)
+                child.make(cell)
+                stack.append(child)
+    finally:
+        ttt.book = saved
+    return positions, errors
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Monte Carlo tree search player for m,n,k-games
+"""
+
+import argparse
+import math
+import random
+import time
+
+from mnk import O, X, Board, Game
+
+# Seconds to think per move, by default
+BUDGET = 1.0
+
+# UCT exploration constant
+EXPLORATION = math.sqrt(2)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play an m,n,k-game against itself by Monte Carlo "
+                    "tree search."
+    )
+    parser.add_argument("m", type=int, nargs="?", default=3,
+                        help="number of rows")
+    parser.add_argument("n", type=int, nargs="?", default=3,
+                        help="number of columns")
+    parser.add_argument("k", type=int, nargs="?", default=3,
+                        help="number in a row needed to win")
+    parser.add_argument("--budget", type=float, default=BUDGET,
+                        help="seconds to think per move")
+    parser.add_argument("--iterations", type=int,
+                        help="playouts per move, instead of a time budget")
+    args = parser.parse_args()
+
+    game = Game(args.m, args.n, args.k)
+    board = Board(game)
+    player = MCTS(game, args.budget, args.iterations)
+    while board.winner is None and not board.full():
+        cell = player.choose(board)
+        print(f"{board.turn} plays {game.position(cell)} "
+              f"({player.iterations} playouts, {player.reused} reused, "
+              f"win rate {player.rate:.2f})")
+        board.make(cell)
+        print(board)
+    print(f"Winner: {board.winner}" if board.winner else "Draw.")
+
+
+class Node():
+    """
+    Position in the search tree, with the results of the playouts
+    through it from the view of the player who moved into it.
+    """
+
+    __slots__ = ("x", "o", "turn", "cell", "parent", "children",
+                 "untried", "winner", "visits", "wins")
+
+    def __init__(self, game, x, o, turn, cell=None, parent=None,
+                 winner=None):
+        self.x = x
+        self.o = o
+        self.turn = turn
+        self.cell = cell
+        self.parent = parent
+        self.children = []
+        self.winner = winner
+        self.visits = 0
+        self.wins = 0.0
+        # Moves not yet added as children, in random order
+        self.untried = []
+        if winner is None:
+            free = game.full & ~(x | o)
+            self.untried = [cell for cell in range(game.cells)
+                            if free >> cell & 1]
+            random.shuffle(self.untried)
+
+    def expand(self, game):
+        """
+        Adds and returns the child for one untried move.
+        """
+        cell = self.untried.pop()
+        x, o = self.x, self.o
+        if self.turn == X:
+            x |= 1 << cell
+            mask = x
+        else:
+            o |= 1 << cell
+            mask = o
+        winner = None
+        for line in game.cell_lines[cell]:
+            if mask & line == line:
+                winner = self.turn
+                break
+        child = Node(game, x, o, O if self.turn == X else X, cell, self,
+                     winner)
+        self.children.append(child)
+        return child
+
+    def select(self, exploration):
+        """
+        Returns the child with the highest upper confidence bound.
+        """
+        log = math.log(self.visits)
+        return max(self.children, key=lambda child: (
+            child.wins / child.visits
+            + exploration * math.sqrt(log / child.visits)
+        ))
+
+
+def playout(game, x, o, turn):
+    """
+    Returns the winner of a game played on from a position by random
+    moves, or None for a draw.
+    """
+    free = game.full & ~(x | o)
+    cells = [cell for cell in range(game.cells) if free >> cell & 1]
+    random.shuffle(cells)
+    for cell in cells:
+        if turn == X:
+            x |= 1 << cell
+            mask = x
+        else:
+            o |= 1 << cell
+            mask = o
+        for line in game.cell_lines[cell]:
+            if mask & line == line:
+                return turn
+        turn = O if turn == X else X
+    return None
+
+
+class MCTS():
+    """
+    Chooses moves by UCT Monte Carlo tree search within a time budget,
+    or a number of playouts, per move. The tree below the position
+    reached is kept from one move to the next.
+    """
+
+    def __init__(self, game, budget=BUDGET, iterations=None,
+                 exploration=EXPLORATION):
+        self.game = game
+        self.budget = budget
+        self.limit = iterations
+        self.exploration = exploration
+        self.root = None
+        self.iterations = 0
+        self.reused = 0
+        self.rate = None
+
+    def choose(self, board):
+        """
+        Returns the most visited move from a Board's position.
+        """
+        if board.winner is not None or board.full():
+            return None
+        self.root = self.find(board)
+        self.root.parent = None
+        self.reused = self.root.visits
+
+        game = self.game
+        exploration = self.exploration
+        deadline = time.perf_counter() + self.budget
+        self.iterations = 0
+        while (self.iterations < self.limit if self.limit is not None
+               else time.perf_counter() < deadline):
+            self.iterations += 1
+
+            # Select down to a node with untried moves or a game over
+            node = self.root
+            while not node.untried and node.children:
+                node = node.select(exploration)
+            if node.untried:
+                node = node.expand(game)
+
+            if node.winner is not None or not node.untried:
+                result = node.winner
+            else:
+                result = playout(game, node.x, node.o, node.turn)
+
+            while node is not None:
+                node.visits += 1
+                if result is None:
+                    node.wins += 0.5
+                elif result != node.turn:
+                    # The player who moved into this node won
+                    node.wins += 1
+                node = node.parent
+
+        best = max(self.root.children, key=lambda child: child.visits)
+        self.rate = best.wins / best.visits
+        return best.cell
+
+    def find(self, board):
+        """
+        Returns the node for a Board's position from the last search,
+        at most two moves on from its root, or a new node.
+        """
+        nodes = [self.root] if self.root is not None else []
+        for _ in range(3):
+            for node in nodes:
+                if (node.x, node.o) == (board.x, board.o):
+                    return node
+            nodes = [child for node in nodes for child in node.children]
+        return Node(self.game, board.x, board.o, board.turn,
+                    winner=board.winner)
+
+
+# Player kept for each board size, so its tree lives on between moves
+players = {}
+
+
+def minimax(board, k=None, budget=BUDGET):
+    """
+    Returns the action (i, j) chosen by tree search for the current
+    player on a list of lists board, with k in a row to win.
+    """
+    position = Board.from_board(board, k)
+    game = position.game
+    size = (game.m, game.n, game.k)
+    if size not in players:
+        players[size] = MCTS(game, budget)
+    players[size].budget = budget
+    cell = players[size].choose(position)
+    return None if cell is None else game.position(cell)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,517 @@
+"""
+m,n,k-game engine: k in a row wins on an m by n board
+"""
+
+import argparse
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+X = "X"
+O = "O"
+EMPTY = None
+
+# Seconds to think per move, by default
+BUDGET = 1.0
+
+# Value of a win, less one per move it takes, so quicker wins score higher
+# and every heuristic value stays well below it
+WIN = 10 ** 9
+
+# Check the clock once every this many nodes
+CHECK = 128
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play an m,n,k-game against itself."
+    )
+    parser.add_argument("m", type=int, nargs="?", default=3,
+                        help="number of rows")
+    parser.add_argument("n", type=int, nargs="?", default=3,
+                        help="number of columns")
+    parser.add_argument("k", type=int, nargs="?", default=3,
+                        help="number in a row needed to win")
+    parser.add_argument("--budget", type=float, default=BUDGET,
+                        help="seconds to think per move")
+    parser.add_argument("--workers", type=int,
+                        help="split each search across this many "
+                             "worker processes")
+    args = parser.parse_args()
+
+    game = Game(args.m, args.n, args.k)
+    board = Board(game)
+    if args.workers:
+        engine = ParallelEngine(game, args.budget, workers=args.workers)
+    else:
+        engine = Engine(game, args.budget)
+    try:
+        while board.winner is None and not board.full():
+            cell = engine.choose(board)
+            print(f"{board.turn} plays {game.position(cell)} "
+                  f"(depth {engine.depth}, {engine.nodes} nodes, "
+                  f"value {engine.value})")
+            board.make(cell)
+            print(board)
+    finally:
+        if args.workers:
+            engine.close()
+    print(f"Winner: {board.winner}" if board.winner else "Draw.")
+
+
+class Game():
+    """
+    Board size and win length, with the mask of every winning line.
+    Cell (i, j) is bit n * i + j of a mask.
+    """
+
+    def __init__(self, m=3, n=3, k=3):
+        if not 0 < k <= max(m, n):
+            raise ValueError("k must fit on the board")
+        self.m = m
+        self.n = n
+        self.k = k
+        self.cells = m * n
+        self.full = (1 << self.cells) - 1
+        self.lines = lines(m, n, k)
+        # Lines through each cell, so a move only checks its own lines
+        self.cell_lines = [[line for line in self.lines if line >> cell & 1]
+                           for cell in range(self.cells)]
+
+    def position(self, cell):
+        """
+        Returns the (i, j) of a cell number.
+        """
+        return divmod(cell, self.n)
+
+    def cell(self, position):
+        """
+        Returns the cell number of an (i, j).
+        """
+        i, j = position
+        return i * self.n + j
+
+
+def lines(m, n, k):
+    """
+    Returns the masks of every run of k cells in a row, column or
+    diagonal of an m by n board.
+    """
+    found = []
+    for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+        for i in range(m):
+            for j in range(n):
+                end_i = i + di * (k - 1)
+                end_j = j + dj * (k - 1)
+                if not (0 <= end_i < m and 0 <= end_j < n):
+                    continue
+                mask = 0
+                for step in range(k):
+                    mask |= 1 << (n * (i + di * step) + j + dj * step)
+                found.append(mask)
+    return found
+
+
+class Board():
+    """
+    Position in an m,n,k-game, kept as one mask of cells per player
+    and changed in place by making and unmaking moves.
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self.x = 0
+        self.o = 0
+        self.turn = X
+        self.moves = []
+        self.winner = None
+
+    @classmethod
+    def from_board(cls, board, k=None):
+        """
+        Returns the Board for a list of lists board, where k defaults
+        to the shorter side of the board.
+        """
+        m, n = len(board), len(board[0])
+        game = Game(m, n, k or min(m, n))
+        self = cls(game)
+        for i, row in enumerate(board):
+            for j, cell in enumerate(row):
+                if cell == X:
+                    self.x |= 1 << (n * i + j)
+                elif cell == O:
+                    self.o |= 1 << (n * i + j)
+        if self.x.bit_count() > self.o.bit_count():
+            self.turn = O
+        for mask, player in ((self.x, X), (self.o, O)):
+            if any(mask & line == line for line in game.lines):
+                self.winner = player
+        return self
+
+    def __str__(self):
+        rows = []
+        for i in range(self.game.m):
+            row = ""
+            for j in range(self.game.n):
+                cell = self.game.cell((i, j))
+                if self.x >> cell & 1:
+                    row += X
+                elif self.o >> cell & 1:
+                    row += O
+                else:
+                    row += "."
+            rows.append(row)
+        return "\n".join(rows)
+
+    def full(self):
+        """
+        Returns True if there are no empty cells.
+        """
+        return self.x | self.o == self.game.full
+
+    def cells(self):
+        """
+        Returns the empty cell numbers, in order.
+        """
+        free = self.game.full & ~(self.x | self.o)
+        return [cell for cell in range(self.game.cells) if free >> cell & 1]
+
+    def make(self, cell):
+        """
+        Plays the player to move into an empty cell number,
+        noting a win if the move completes a line.
+        """
+        if self.turn == X:
+            self.x |= 1 << cell
+            mask = self.x
+        else:
+            self.o |= 1 << cell
+            mask = self.o
+        for line in self.game.cell_lines[cell]:
+            if mask & line == line:
+                self.winner = self.turn
+                break
+        self.turn = O if self.turn == X else X
+        self.moves.append(cell)
+
+    def unmake(self):
+        """
+        Takes back the last move made.
+        """
+        cell = self.moves.pop()
+        self.x &= ~(1 << cell)
+        self.o &= ~(1 << cell)
+        self.turn = O if self.turn == X else X
+        # The game ends at a win, so no earlier position had a winner
+        self.winner = None
+
+
+def line_heuristic(board):
+    """
+    Returns an estimate of a position's value for X: every line still
+    open to only one player counts for that player, more the more of
+    it they already hold.
+    """
+    score = 0
+    x, o = board.x, board.o
+    for line in board.game.lines:
+        xs = (x & line).bit_count()
+        os = (o & line).bit_count()
+        if xs and not os:
+            score += 4 ** xs
+        elif os and not xs:
+            score -= 4 ** os
+    return score
+
+
+class Timeout(Exception):
+    """
+    Raised inside a search when its time budget has run out.
+    """
+
+
+class Engine():
+    """
+    Chooses moves by iterative-deepening alpha-beta search within a time
+    budget per move, scoring unfinished positions with a heuristic that
+    takes a Board and returns its value for X. A `limit` stops deepening
+    at that many moves ahead even if there is time left.
+    """
+
+    def __init__(self, game, budget=BUDGET, heuristic=line_heuristic,
+                 limit=None):
+        self.game = game
+        self.budget = budget
+        self.heuristic = heuristic
+        self.limit = limit
+        # Best move found for each position searched, tried first
+        # when that position is searched again one ply deeper
+        self.best = {}
+        self.depth = 0
+        self.nodes = 0
+        self.value = None
+        self.deadline = math.inf
+        # Window every node is searched within, which a parallel worker
+        # narrows as other root moves finish
+        self.floor = -math.inf
+        self.ceiling = math.inf
+
+    def choose(self, board):
+        """
+        Returns the best cell for the player to move found before the
+        budget runs out, deepening the search one ply at a time.
+        """
+        self.deadline = time.perf_counter() + self.budget
+        self.nodes = 0
+        self.depth = 0
+        self.value = None
+        start = len(board.moves)
+        remaining = len(board.cells())
+        if board.winner is not None or not remaining:
+            return None
+
+        # Until a search finishes, fall back on the first move in order
+        move = self.ordered(board)[0]
+        if self.limit is not None:
+            remaining = min(remaining, self.limit)
+        for depth in range(1, remaining + 1):
+            try:
+                cell, value = self.root(board, depth)
+            except Timeout as timeout:
+                # Unwind the moves the interrupted search had made
+                while len(board.moves) > start:
+                    board.unmake()
+                # Moves searched at the new depth before time ran out
+                # still beat the previous best, which was tried first
+                if timeout.args and timeout.args[0] is not None:
+                    move, self.value = timeout.args[0]
+                    self.depth = depth
+                break
+            move, self.value, self.depth = cell, value, depth
+            # Stop once the result is proven
+            if abs(value) >= WIN - self.game.cells:
+                break
+        return move
+
+    def root(self, board, depth):
+        """
+        Returns the best (cell, value) for the player to move when
+        searching `depth` moves ahead.
+        """
+        maximizing = board.turn == X
+        alpha, beta = -math.inf, math.inf
+        best = None
+        for cell in self.ordered(board):
+            board.make(cell)
+            try:
+                value = self.search(board, depth - 1, alpha, beta, 1)
+            except Timeout:
+                raise Timeout(best)
+            board.unmake()
+            if best is None or (value > best[1] if maximizing
+                                else value < best[1]):
+                best = (cell, value)
+            if maximizing:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+        self.best[(board.x, board.o)] = best[0]
+        return best
+
+    def search(self, board, depth, alpha, beta, ply):
+        """
+        Returns the alpha-beta value for X of a position, searching
+        `depth` more moves ahead of `ply` moves from the root.
+        """
+        self.nodes += 1
+        if self.nodes % CHECK == 0:
+            if time.perf_counter() > self.deadline:
+                raise Timeout(None)
+            self.narrow()
+        if board.winner == X:
+            return WIN - ply
+        if board.winner == O:
+            return ply - WIN
+        if board.full():
+            return 0
+        if depth == 0:
+            return self.heuristic(board)
+
+        alpha = max(alpha, self.floor)
+        beta = min(beta, self.ceiling)
+        maximizing = board.turn == X
+        v = -math.inf if maximizing else math.inf
+        best = None
+        for cell in self.ordered(board):
+            board.make(cell)
+            value = self.search(board, depth - 1, alpha, beta, ply + 1)
+            board.unmake()
+            if maximizing:
+                if value > v:
+                    v, best = value, cell
+                alpha = max(alpha, v)
+            else:
+                if value < v:
+                    v, best = value, cell
+                beta = min(beta, v)
+            if alpha >= beta:
+                break
+        self.best[(board.x, board.o)] = best
+        return v
+
+    def narrow(self):
+        """
+        Called every CHECK nodes to narrow the floor and ceiling, which
+        stay open in a serial search.
+        """
+
+    def ordered(self, board):
+        """
+        Returns the empty cells, best move from an earlier search first,
+        then nearest the centre first.
+        """
+        m, n = self.game.m, self.game.n
+        cells = sorted(board.cells(), key=lambda cell: (
+            abs(2 * (cell // n) - (m - 1)) + abs(2 * (cell % n) - (n - 1))
+        ))
+        best = self.best.get((board.x, board.o))
+        if best is not None:
+            cells.remove(best)
+            cells.insert(0, best)
+        return cells
+
+
+# Engine and the best root value found so far, for each parallel worker
+worker = None
+shared = None
+
+
+class Worker(Engine):
+    """
+    Engine that searches one root move for `side` at a time, cutting
+    off lines that cannot beat the best root value in `shared`.
+
+    The bound is lowered by one so a move that only ties still gets its
+    exact value, which the parent needs to break ties the same way as a
+    serial search.
+    """
+
+    side = X
+
+    def narrow(self):
+        with shared.get_lock():
+            bound = shared.value
+        if self.side == X:
+            self.floor = max(self.floor, bound - 1)
+        else:
+            self.ceiling = min(self.ceiling, bound + 1)
+
+
+def start_worker(game, heuristic, best):
+    """
+    Sets up a parallel search worker process.
+    """
+    global worker, shared
+    worker = Worker(game, heuristic=heuristic)
+    shared = best
+
+
+def search_move(task):
+    """
+    Returns (value, nodes) for one root move searched in a worker,
+    or (None, nodes) if its time ran out first.
+
+    Other root moves already searched raise the bound the move has to
+    beat, shared through `shared` and read again as the search goes on.
+    """
+    x, o, turn, cell, depth, deadline = task
+    board = Board(worker.game)
+    board.x, board.o, board.turn = x, o, turn
+    maximizing = turn == X
+    board.make(cell)
+    worker.nodes = 0
+    # The deadline is wall-clock time, which all processes agree on
+    worker.deadline = time.perf_counter() + (deadline - time.time())
+    if time.perf_counter() > worker.deadline:
+        return None, 0
+    worker.side = turn
+    worker.floor, worker.ceiling = -math.inf, math.inf
+    worker.narrow()
+    try:
+        value = worker.search(board, depth - 1, -math.inf, math.inf, 1)
+    except Timeout:
+        return None, worker.nodes
+    with shared.get_lock():
+        if value > shared.value if maximizing else value < shared.value:
+            shared.value = value
+    return value, worker.nodes
+
+
+class ParallelEngine(Engine):
+    """
+    Engine that splits the moves at the root of each search across a
+    pool of worker processes, returning the same move as Engine. The
+    first move in order, usually the best, is searched here before the
+    rest are split, so they start with its value as the bound to beat.
+
+    The heuristic must return whole numbers and be picklable, such as
+    a function defined at the top level of a module.
+    """
+
+    def __init__(self, game, budget=BUDGET, heuristic=line_heuristic,
+                 limit=None, workers=None):
+        super().__init__(game, budget, heuristic, limit)
+        self.shared = multiprocessing.Value("q", 0)
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers, initializer=start_worker,
+            initargs=(game, heuristic, self.shared)
+        )
+
+    def close(self):
+        self.pool.shutdown()
+
+    def root(self, board, depth):
+        """
+        Returns the best (cell, value) for the player to move when
+        searching `depth` moves ahead, taking the first of the moves
+        in order with the best value, as a serial search would.
+        """
+        maximizing = board.turn == X
+        cells = self.ordered(board)
+        board.make(cells[0])
+        value = self.search(board, depth - 1, -math.inf, math.inf, 1)
+        board.unmake()
+        best = (cells[0], value)
+        self.shared.value = value
+
+        deadline = time.time() + (self.deadline - time.perf_counter())
+        tasks = [(board.x, board.o, board.turn, cell, depth, deadline)
+                 for cell in cells[1:]]
+        results = list(self.pool.map(search_move, tasks))
+        self.nodes += sum(nodes for _, nodes in results)
+        for cell, (value, _) in zip(cells[1:], results):
+            if value is not None and (value > best[1] if maximizing
+                                      else value < best[1]):
+                best = (cell, value)
+        if any(value is None for value, _ in results):
+            # As in a serial search, the moves finished so far still
+            # count, since the previous best, which comes first, is done
+            raise Timeout(best)
+        self.best[(board.x, board.o)] = best[0]
+        return best
+
+
+def best_move(board, k=None, budget=BUDGET, heuristic=line_heuristic):
+    """
+    Returns the best action (i, j) found within `budget` seconds for the
+    current player on a list of lists board, with k in a row to win.
+    """
+    bitboard = Board.from_board(board, k)
+    engine = Engine(bitboard.game, budget, heuristic)
+    cell = engine.choose(bitboard)
+    return None if cell is None else bitboard.game.position(cell)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import unittest
+
+import book
+from bitboard import Bitboard
+
+
+class BookTest(unittest.TestCase):
+
+    def setUp(self):
+        self.book = book.load_book()
+        self.assertIsNotNone(self.book, "no book: run book.py first")
+
+    def test_agrees_with_live_search(self):
+        positions, errors = book.verify(self.book)
+        self.assertGreater(positions, 0)
+        self.assertEqual(errors, 0)
+
+    def test_matches_fresh_solve(self):
+        entries = {}
+        book.solve(Bitboard(), entries)
+        self.assertEqual(self.book.entries, entries)
+
+
+if __name__ == "__main__":
+    unittest.main()
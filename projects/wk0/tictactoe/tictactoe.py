@@ -3,12 +3,34 @@ Tic Tac Toe Player
 """
 
 import math
-import copy
+import os
+
+import mcts
+from bitboard import Bitboard
+from book import load_book
 
 X = "X"
 O = "O"
 EMPTY = None
 
+# Whether a stored value is exact, or only a lower or upper bound
+# because the search that found it was cut off by alpha or beta
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Transposition table of canonical board -> (value, flag). A position's
+# value never depends on how it was reached, so the table is kept for
+# the life of the process and later moves are mostly lookups.
+table = {}
+
+# Set TICTACTOE_PLAYER=mcts to have minimax hand over to tree search
+PLAYER = os.environ.get("TICTACTOE_PLAYER", "minimax")
+
+# Best move for every reachable position, if book.py has written a book,
+# so that minimax is a lookup instead of a search
+book = load_book()
+
 def initial_state():
     """
     Returns starting state of the board.
@@ -21,97 +43,100 @@ def player(board):
     """
     Returns player who has the next turn on a board.
     """
-    if terminal(board):
+    bitboard = Bitboard.from_board(board)
+    if bitboard.terminal():
         return None
-    elif len([cell for row in board for cell in row if cell is X]) > len([cell for row in board for cell in row if cell is O]):
-        return O
-    else:
-        return X
+    return bitboard.turn()
 
 def actions(board):
     """
     Returns set of all possible actions (i, j) available on the board.
     """
-    action_list = [(i, j) for i, row in enumerate(board) for j, cell in enumerate(row) if cell is EMPTY]
-    return set(action_list)
+    return {divmod(cell, 3) for cell in Bitboard.from_board(board).cells()}
 
 def result(board, action):
     """
     Returns the board that results from making move (i, j) on the board.
     """
     i, j = action
-    resultant = copy.deepcopy(board)
-    if terminal(board):
+    bitboard = Bitboard.from_board(board)
+    if bitboard.terminal():
         raise KeyboardInterrupt("Game over.")
     elif action not in actions(board):
         raise KeyboardInterrupt("This action is not a legal move.")
-    resultant[i][j] = player(resultant)
-    return resultant
+    bitboard.make(3 * i + j)
+    return bitboard.to_board()
 
 def winner(board):
     """
     Returns the winner of the game, if there is one.
     """
-    runs = [
-        # Horizontals
-        [(0, 0), (0, 1), (0, 2)],
-        [(1, 0), (1, 1), (1, 2)], 
-        [(2, 0), (2, 1), (2, 2)],
-        # Verticals
-        [(0, 0), (1, 0), (2, 0)], 
-        [(0, 1), (1, 1), (2, 1)], 
-        [(0, 2), (1, 2), (2, 2)], 
-        # Diagonals
-        [(0, 0), (1, 1), (2, 2)],
-        [(0, 2), (1, 1), (2, 0)]
-    ]
-    for player in (X, O):
-        for run in runs:
-            if [board[i][j] for i, j in run] == [player] * 3:
-                return player
+    return Bitboard.from_board(board).winner()
 
 def terminal(board):
     """
     Returns True if game is over, False otherwise.
     """
-    if winner(board) is not None:
-        # Win
-        return True
-    elif [cell for row in board for cell in row if cell is EMPTY]:
-        # Ongoing
-        return False
-    else:
-        # Draw
-        return True
+    return Bitboard.from_board(board).terminal()
 
 def utility(board):
     """
     Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
     """
-    if winner(board) == X:
-        return 1
-    elif winner(board) == O:
-        return -1
-    else:
-        return 0
+    return Bitboard.from_board(board).utility()
 
-def minimax(board):
+def minimax(board, stats=None):
     """
     Returns the optimal action for the current player on the board.
+
+    If `stats` is a dict, the number of positions searched is counted
+    in stats["nodes"].
     """
+    if PLAYER == "mcts":
+        return mcts.minimax(board)
     alpha = -math.inf
     beta = math.inf
-    def pruning(board, player, alpha, beta):
+    # search one bitboard, making and unmaking moves in place
+    bitboard = Bitboard.from_board(board)
+
+    def pruning(bitboard, player, alpha, beta):
+        if stats is not None:
+            stats["nodes"] = stats.get("nodes", 0) + 1
         # if end-game is reached
-        if terminal(board):
+        if bitboard.terminal():
             # return the board's utility
-            return utility(board)
-        elif player is X:
+            return bitboard.utility()
+        # reuse what an earlier search learned about this position
+        key = bitboard.key()
+        if key in table:
+            value, flag = table[key]
+            if flag == EXACT:
+                return value
+            elif flag == LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                return value
+        v = search(bitboard, player, alpha, beta)
+        # a value outside the window only bounds the true value
+        if v <= alpha:
+            table[key] = (v, UPPER)
+        elif v >= beta:
+            table[key] = (v, LOWER)
+        else:
+            table[key] = (v, EXACT)
+        return v
+
+    def search(bitboard, player, alpha, beta):
+        if player is X:
             # start low to work up
             v = -math.inf
-            for action in actions(board):
+            for cell in bitboard.cells():
                 # choose the highest of the immediate options for this move
-                v = max(v, pruning(result(board, action), O, alpha, beta))
+                bitboard.make(cell)
+                v = max(v, pruning(bitboard, O, alpha, beta))
+                bitboard.unmake()
                 # replace alpha with v if v is higher
                 alpha = max(alpha, v)
                 # if above the beta threshold
@@ -121,39 +146,43 @@ def minimax(board):
             return v
         elif player is O:
             v = math.inf
-            for action in actions(board):
-                v = min(v, pruning(result(board, action), X, alpha, beta))
+            for cell in bitboard.cells():
+                bitboard.make(cell)
+                v = min(v, pruning(bitboard, X, alpha, beta))
+                bitboard.unmake()
                 beta = min(beta, v)
                 if alpha >= beta:
                     break
             return v
 
-    if terminal(board):
+    move = None
+    if bitboard.terminal():
         # End of Play
-        move = None
-    elif board is [[EMPTY]*3]*3:
-        # Blank board, go for center
-        move = (1, 1)
-    if player(board) is X:
+        return move
+    if book is not None:
+        entry = book.lookup(bitboard)
+        if entry is not None:
+            return divmod(entry[0], 3)
+    if bitboard.turn() is X:
         # Start low to work up
         v = -math.inf
-        for action in actions(board):
+        for cell in bitboard.cells():
             # start searching down choices with alpha-beta pruning
-            v_prime = pruning(result(board, action), O, alpha, beta)
+            bitboard.make(cell)
+            v_prime = pruning(bitboard, O, alpha, beta)
+            bitboard.unmake()
             alpha = max(v, v_prime)
             if v_prime > v:
                 v = v_prime
-                move = action
-    elif player(board) is O:
+                move = divmod(cell, 3)
+    else:
         v = math.inf
-        for action in actions(board):
-            v_prime = pruning(result(board, action), X, alpha, beta)
+        for cell in bitboard.cells():
+            bitboard.make(cell)
+            v_prime = pruning(bitboard, X, alpha, beta)
+            bitboard.unmake()
             beta = min(v, v_prime)
             if v_prime < v:
                 v = v_prime
-                move = action
-    else:
-        raise KeyboardInterrupt("Unexpected state.")
+                move = divmod(cell, 3)
     return move
-
-    
@@ -0,0 +1,260 @@
+"""
+Reduced ordered binary decision diagrams for logical sentences
+"""
+
+# Node numbers of the two terminals
+FALSE = 0
+TRUE = 1
+
+# Entries the operation cache holds before it is emptied
+CACHE = 1 << 20
+
+# Most passes the ordering heuristic makes over the variables
+FORCE = 20
+
+
+class BDD():
+    """
+    Shared reduced ordered binary decision diagrams over named boolean
+    variables. Each node is a number whose variable, low child (the
+    variable false) and high child (the variable true) are looked up by
+    that number. The unique table keeps one node for each of these
+    triples, so equivalent functions are the same node, and the
+    operation cache remembers each if-then-else already worked out.
+    Variables not in the order are added after the rest as they are met.
+    """
+
+    def __init__(self, order=()):
+        self.order = []
+        self.levels = {}
+        # Per node, from 2 after the terminals
+        self.node_levels = [None, None]
+        self.lows = [None, None]
+        self.highs = [None, None]
+        self.unique = {}
+        self.cache = {}
+        self.compiled = {}
+        for name in order:
+            self.variable(name)
+
+    def level(self, u):
+        """
+        Returns the position in the order of a node's variable, or the
+        number of variables for a terminal.
+        """
+        return len(self.order) if u <= TRUE else self.node_levels[u]
+
+    def node(self, level, low, high):
+        """
+        Returns the node for a variable's level and two children.
+        """
+        if low == high:
+            return low
+        key = (level, low, high)
+        u = self.unique.get(key)
+        if u is None:
+            u = len(self.lows)
+            self.node_levels.append(level)
+            self.lows.append(low)
+            self.highs.append(high)
+            self.unique[key] = u
+        return u
+
+    def variable(self, name):
+        """
+        Returns the node true exactly when a variable is.
+        """
+        if name not in self.levels:
+            self.levels[name] = len(self.order)
+            self.order.append(name)
+        return self.node(self.levels[name], FALSE, TRUE)
+
+    def ite(self, f, g, h):
+        """
+        Returns the node for if f then g else h.
+        """
+        if f == TRUE or g == h:
+            return g
+        if f == FALSE:
+            return h
+        if g == TRUE and h == FALSE:
+            return f
+        key = (f, g, h)
+        u = self.cache.get(key)
+        if u is not None:
+            return u
+
+        # Split on the first variable any of the three depends on
+        top = min(self.level(f), self.level(g), self.level(h))
+        cofactors = [
+            (self.lows[x], self.highs[x]) if self.level(x) == top else (x, x)
+            for x in (f, g, h)
+        ]
+        (f0, f1), (g0, g1), (h0, h1) = cofactors
+        u = self.node(top, self.ite(f0, g0, h0), self.ite(f1, g1, h1))
+        if len(self.cache) >= CACHE:
+            self.cache.clear()
+        self.cache[key] = u
+        return u
+
+    def negate(self, u):
+        return self.ite(u, FALSE, TRUE)
+
+    def conjoin(self, u, v):
+        return self.ite(u, v, FALSE)
+
+    def disjoin(self, u, v):
+        return self.ite(u, TRUE, v)
+
+    def compile(self, sentence):
+        """
+        Returns the node for a sentence, building it the first time the
+        sentence is seen.
+        """
+        if sentence not in self.compiled:
+            self.compiled[sentence] = sentence.diagram(self)
+        return self.compiled[sentence]
+
+    def nodes(self, u):
+        """
+        Returns the nodes reachable from a node, each after its
+        children, terminals included.
+        """
+        seen = set()
+        nodes = []
+        stack = [(u, False)]
+        while stack:
+            u, done = stack.pop()
+            if done:
+                nodes.append(u)
+            elif u not in seen:
+                seen.add(u)
+                stack.append((u, True))
+                if u > TRUE:
+                    stack.append((self.highs[u], False))
+                    stack.append((self.lows[u], False))
+        return nodes
+
+    def size(self, u):
+        """
+        Returns the number of nodes reachable from a node.
+        """
+        return len(self.nodes(u))
+
+    def bottom(self, u):
+        """
+        Returns the deepest level of the variables a node depends on, or
+        -1 for a terminal.
+        """
+        return max([self.node_levels[v] for v in self.nodes(u) if v > TRUE],
+                   default=-1)
+
+    def support(self, u):
+        """
+        Returns the names of the variables a node depends on.
+        """
+        return {self.order[self.node_levels[v]]
+                for v in self.nodes(u) if v > TRUE}
+
+    def count_models(self, u, names=None):
+        """
+        Returns the number of assignments to a set of variable names,
+        by default every variable in the diagram, under which a node is
+        true. The names must include every variable it depends on.
+        """
+        n = len(self.order)
+        counts = {FALSE: 0, TRUE: 1}
+        for v in self.nodes(u):
+            if v > TRUE:
+                level = self.node_levels[v]
+                low, high = self.lows[v], self.highs[v]
+                counts[v] = (
+                    (counts[low] << (self.level(low) - level - 1))
+                    + (counts[high] << (self.level(high) - level - 1))
+                )
+        count = counts[u] << self.level(u)
+        if names is None:
+            return count
+
+        # Variables outside the names do not matter, so they double the
+        # count, and names outside the diagram double it in turn
+        names = set(names)
+        if not self.support(u) <= names:
+            raise ValueError("names do not include every variable used")
+        inside = len(names & self.levels.keys())
+        return (count >> (n - inside)) << (len(names) - inside)
+
+    def entails(self, u, v):
+        """
+        Returns whether node v is true whenever node u is.
+        """
+        return self.ite(u, v, TRUE) == TRUE
+
+    def condition(self, u, evidence):
+        """
+        Returns the node for u with some variables fixed, given as a
+        dict of names to values.
+        """
+        fixed = {self.levels[name]: value
+                 for name, value in evidence.items() if name in self.levels}
+        results = {FALSE: FALSE, TRUE: TRUE}
+        for v in self.nodes(u):
+            if v > TRUE:
+                level = self.node_levels[v]
+                if level in fixed:
+                    results[v] = results[
+                        self.highs[v] if fixed[level] else self.lows[v]
+                    ]
+                else:
+                    results[v] = self.node(level, results[self.lows[v]],
+                                           results[self.highs[v]])
+        return results[u]
+
+
+def ordering(sentence, passes=FORCE):
+    """
+    Returns an order for a sentence's symbols that keeps the symbols of
+    each top-level conjunct close together, so the diagram stays small.
+
+    Symbols start in the order they are first met, then are moved by
+    the FORCE heuristic: on each pass, each symbol goes to the mean
+    centre of the conjuncts it appears in. The order with the shortest
+    total span of the conjuncts is kept.
+    """
+    conjuncts = getattr(sentence, "conjuncts", None) or (sentence,)
+    order = []
+    seen = set()
+    stack = [sentence]
+    while stack:
+        part = stack.pop()
+        name = getattr(part, "name", None)
+        if name is not None:
+            if name not in seen:
+                seen.add(name)
+                order.append(name)
+        else:
+            stack.extend(reversed(part.parts))
+    edges = [sorted(conjunct.symbols()) for conjunct in conjuncts]
+    edges = [edge for edge in edges if len(edge) > 1]
+
+    def span(order):
+        position = {name: i for i, name in enumerate(order)}
+        return sum(max(position[name] for name in edge)
+                   - min(position[name] for name in edge)
+                   for edge in edges)
+
+    best, shortest = order, span(order)
+    for _ in range(passes):
+        position = {name: i for i, name in enumerate(order)}
+        centres = {name: [] for name in order}
+        for edge in edges:
+            centre = sum(position[name] for name in edge) / len(edge)
+            for name in edge:
+                centres[name].append(centre)
+        order = sorted(order, key=lambda name: (
+            sum(centres[name]) / len(centres[name]) if centres[name]
+            else position[name]
+        ))
+        if span(order) < shortest:
+            best, shortest = order, span(order)
+    return best
@@ -0,0 +1,209 @@
+import argparse
+import random
+import time
+
+import puzzle
+from bdd import BDD, ordering
+from logic import *
+
+# Largest number of symbols the enumerator is run on
+ENUMERATE = 16
+
+# Largest number of symbols truth tables are worked out for
+TRUTH_TABLE = 24
+
+# Largest number of people whose puzzles are compiled to BDDs
+DIAGRAM = 64
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check model_check's modes against each other and time "
+                    "it on generated knights and knaves puzzles."
+    )
+    parser.add_argument("--people", type=int, nargs="+",
+                        default=[4, 8, 16, 32, 64],
+                        help="numbers of people to generate puzzles for")
+    parser.add_argument("--puzzles", type=int, default=5,
+                        help="puzzles per number of people")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    errors = check_puzzles()
+    print(f"puzzle.py: {errors} differences between modes")
+
+    print(f"{'people':>7}{'symbols':>9}{'queries':>9}{'sat s':>9}"
+          f"{'batch s':>10}{'table s':>10}{'enumerate s':>13}{'solved':>8}")
+    for people in args.people:
+        times = {"single": 0, "sat": 0, "truth_table": 0, "enumerate": 0}
+        queries = solved = 0
+        for _ in range(args.puzzles):
+            knowledge, symbols = generate(people)
+            queries += len(symbols)
+
+            # One call per query, then each mode once for every query
+            start = time.perf_counter()
+            entailed = [model_check(knowledge, symbol) for symbol in symbols]
+            times["single"] += time.perf_counter() - start
+            solved += sum(entailed)
+            for mode, limit in (("sat", None), ("truth_table", TRUTH_TABLE),
+                                ("enumerate", ENUMERATE)):
+                if limit is not None and len(symbols) > limit:
+                    times[mode] = None
+                    continue
+                start = time.perf_counter()
+                if model_check_many(knowledge, symbols, mode) != entailed:
+                    errors += 1
+                times[mode] += time.perf_counter() - start
+        columns = [f"{times[mode]:.3f}" if times[mode] is not None else "-"
+                   for mode in ("sat", "truth_table", "enumerate")]
+        print(f"{people:>7}{2 * people:>9}{queries:>9}"
+              f"{times['single']:>9.3f}{columns[0]:>10}{columns[1]:>10}"
+              f"{columns[2]:>13}{solved:>8}")
+    print(f"{errors} differences between modes in total")
+
+    # An agent told one statement at a time, asking after each
+    print(f"{'people':>7}{'turns':>7}{'rebuild s':>11}{'incremental s':>15}")
+    for people in args.people:
+        knowledge, symbols = generate(people)
+        rebuild, incremental, differences = compare_incremental(
+            knowledge.conjuncts, symbols)
+        errors += differences
+        print(f"{people:>7}{len(knowledge.conjuncts):>7}{rebuild:>11.3f}"
+              f"{incremental:>15.3f}")
+
+    # Compiling to a BDD once, under two variable orders
+    print(f"{'people':>7}{'order':>8}{'nodes':>8}{'built':>10}"
+          f"{'compile s':>11}{'queries s':>11}{'models':>8}")
+    for people in args.people:
+        if people > DIAGRAM:
+            continue
+        knowledge, symbols = generate(people)
+        entailed = model_check_many(knowledge, symbols)
+        for name, order in (("sorted", sorted(knowledge.symbols())),
+                            ("force", ordering(knowledge))):
+            result = compare_diagram(knowledge, symbols, order)
+            nodes, built, compile_time, query_time, models, answers = result
+            errors += answers != entailed
+            print(f"{people:>7}{name:>8}{nodes:>8}{built:>10}"
+                  f"{compile_time:>11.3f}{query_time:>11.4f}{models:>8}")
+    print(f"{errors} differences in total")
+
+
+def check_puzzles():
+    """
+    Returns the number of puzzle.py queries where model_check's modes
+    disagree.
+    """
+    symbols = [puzzle.AKnight, puzzle.AKnave, puzzle.BKnight,
+               puzzle.BKnave, puzzle.CKnight, puzzle.CKnave]
+    knowledge = [puzzle.knowledge0, puzzle.knowledge1, puzzle.knowledge2,
+                 puzzle.knowledge3]
+    errors = 0
+    for kb in knowledge:
+        entailed = [model_check(kb, symbol) for symbol in symbols]
+        for mode in ("sat", "truth_table", "enumerate"):
+            batch = model_check_many(kb, symbols, mode)
+            errors += sum(a != b for a, b in zip(entailed, batch))
+            errors += sum(model_check(kb, symbol, mode) != expected
+                          for symbol, expected in zip(symbols, entailed))
+    return errors
+
+
+def compare_incremental(sentences, queries):
+    """
+    Adds sentences one at a time, asking every query after each, both
+    by rebuilding from the sentences so far and with one KnowledgeBase.
+    Returns the seconds each took and the number of answers that differ.
+    """
+    start = time.perf_counter()
+    rebuilt = [model_check_many(And(*sentences[:turn + 1]), queries)
+               for turn in range(len(sentences))]
+    rebuild = time.perf_counter() - start
+
+    start = time.perf_counter()
+    kb = KnowledgeBase()
+    answers = []
+    for sentence in sentences:
+        kb.add(sentence)
+        answers.append(kb.ask_many(queries))
+    incremental = time.perf_counter() - start
+
+    differences = sum(a != b for turn, answer in zip(rebuilt, answers)
+                      for a, b in zip(turn, answer))
+    return rebuild, incremental, differences
+
+
+def compare_diagram(knowledge, queries, order):
+    """
+    Compiles the knowledge into a BDD with a variable order, then asks
+    every query. Returns the diagram's size, the nodes built on the
+    way, the seconds each step took, the number of models and the
+    answers.
+    """
+    start = time.perf_counter()
+    bdd = BDD(order)
+    u = bdd.compile(knowledge)
+    compile_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    answers = [bdd.entails(u, bdd.compile(query)) for query in queries]
+    models = bdd.count_models(u)
+    query_time = time.perf_counter() - start
+
+    # Conditioning on either value of a symbol splits the models
+    for query in queries:
+        name = query.name
+        split = sum(bdd.count_models(bdd.condition(u, {name: value}))
+                    for value in (False, True))
+        if split != 2 * models:
+            answers = None
+    return (bdd.size(u), len(bdd.lows), compile_time, query_time, models,
+            answers)
+
+
+def generate(people):
+    """
+    Returns the knowledge and the knight and knave symbols for a random
+    puzzle where each person makes one statement about others, built to
+    be consistent with a hidden assignment of knights and knaves.
+    """
+    knights = [Symbol(f"{i} is a Knight") for i in range(people)]
+    knaves = [Symbol(f"{i} is a Knave") for i in range(people)]
+    hidden = [random.random() < 0.5 for _ in range(people)]
+    knowledge = [Not(Biconditional(knights[i], knaves[i]))
+                 for i in range(people)]
+
+    def kind(j):
+        return knights[j] if random.random() < 0.5 else knaves[j]
+
+    def holds(sentence):
+        return sentence.evaluate({
+            symbol.name: is_knight == (symbol is knights[j])
+            for j, is_knight in enumerate(hidden)
+            for symbol in (knights[j], knaves[j])
+        })
+
+    for i in range(people):
+        others = random.sample([j for j in range(people) if j != i],
+                               min(3, people - 1))
+        statement = random.choice([
+            lambda: kind(others[0]),
+            lambda: And(*[kind(j) for j in others[:2]]),
+            lambda: Or(*[kind(j) for j in others]),
+            lambda: Biconditional(knights[others[0]], knights[others[1]]),
+            lambda: Implication(kind(others[0]), kind(others[-1]))
+        ])()
+        # Knights tell the truth and knaves lie
+        if holds(statement) != hidden[i]:
+            statement = Not(statement)
+        knowledge.append(Or(
+            Biconditional(knights[i], statement),
+            Biconditional(knaves[i], Not(statement))
+        ))
+    return And(*knowledge), knights + knaves
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,76 @@
+import functools
 import itertools
+import weakref
+
+from bdd import FALSE, TRUE
+from sat import CNF
+
+# Deepest nesting of a compiled sentence before parts of it are
+# assigned to local names, to stay inside Python's parser limits
+NESTING = 50
+
+# Truth tables are worked out for 2 ** CHUNK models at a time
+CHUNK = 16
+
+# Most recent models a KnowledgeBase keeps to rule out queries with
+MODELS = 16
+
+# Most symbols new to a model that are tried to keep it a model
+EXTEND = 4
+
+
+def cached(formula):
+    """Caches a sentence's formula, which can never change."""
+    @functools.wraps(formula)
+    def cached_formula(self):
+        if self.text is None:
+            object.__setattr__(self, "text", formula(self))
+        return self.text
+    return cached_formula
 
 
 class Sentence():
+    """Sentences are immutable and interned: building a sentence equal to
+    one that already exists returns that same object, so equal sentences
+    are identical and compare and hash without walking their parts."""
+
+    __slots__ = ("parts", "hash", "symbol_set", "text", "__weakref__")
+
+    # Every sentence still in use, by class and parts
+    interned = weakref.WeakValueDictionary()
+
+    @classmethod
+    def intern(cls, parts, symbols=None, **fields):
+        """Returns the sentence of this class with these parts, creating
+        it with the given field values if there is none yet."""
+        key = (cls, parts)
+        sentence = Sentence.interned.get(key)
+        if sentence is None:
+            sentence = object.__new__(cls)
+            if symbols is None:
+                symbols = frozenset().union(*[part.symbol_set
+                                              for part in parts])
+            for name, value in (("parts", parts),
+                                ("hash", hash((cls.__name__, parts))),
+                                ("symbol_set", symbols),
+                                ("text", None),
+                                *fields.items()):
+                object.__setattr__(sentence, name, value)
+            Sentence.interned[key] = sentence
+        return sentence
+
+    def __hash__(self):
+        return self.hash
+
+    def __setattr__(self, name, value):
+        raise AttributeError("sentences are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("sentences are immutable")
+
+    def __reduce__(self):
+        # Copies and unpickled sentences are interned again
+        return (self.__class__, self.parts)
 
     def evaluate(self, model):
         """Evaluates the logical sentence."""
@@ -12,8 +81,69 @@ class Sentence():
         return ""
 
     def symbols(self):
-        """Returns a set of all symbols in the logical sentence."""
-        return set()
+        """Returns a frozenset of all symbols in the logical sentence."""
+        return self.symbol_set
+
+    def define(self, cnf):
+        """Adds clauses defining a literal equivalent to the sentence
+        to a CNF, and returns the literal."""
+        raise Exception("nothing to define")
+
+    def diagram(self, bdd):
+        """Returns the node for the sentence in a BDD."""
+        raise Exception("nothing to diagram")
+
+    def compile(self, symbols=None):
+        """Returns a function that evaluates the sentence on a tuple of
+        bools, one for each symbol name in `symbols`, which defaults to
+        the sentence's symbols in sorted order. The function's `symbols`
+        attribute is that order."""
+        if symbols is None:
+            symbols = sorted(self.symbols())
+        positions = {name: i for i, name in enumerate(symbols)}
+        lines = []
+        result = self.emit(positions, lines, {})
+        source = "def evaluate(m):\n"
+        for line in lines:
+            source += f"    {line}\n"
+        source += f"    return {result}\n"
+        namespace = {}
+        exec(source, namespace)
+        evaluate = namespace["evaluate"]
+        evaluate.symbols = tuple(symbols)
+        return evaluate
+
+    def emit(self, positions, lines, names, depth=0):
+        """Returns a Python expression for the sentence over the tuple m,
+        nested so that and and or short-circuit. Sentences nested more
+        deeply than NESTING are instead assigned to a local name by a
+        line run before the expression."""
+        if depth < NESTING:
+            expression = self.expression(positions, lines, names, depth + 1)
+            return f"({expression})"
+        if self not in names:
+            expression = self.expression(positions, lines, names, 1)
+            names[self] = f"t{len(names)}"
+            lines.append(f"{names[self]} = {expression}")
+        return names[self]
+
+    def expression(self, positions, lines, names, depth):
+        """Returns a Python expression for the sentence over the tuple m."""
+        raise Exception("nothing to compile")
+
+    def truth_table(self, columns, full, table):
+        """Returns an int with bit i set if the sentence is true in the
+        i-th of a run of models, given the same for each symbol name in
+        `columns`. `full` has a bit set for every model in the run, and
+        `table` remembers the result for each sentence already seen."""
+        if self not in table:
+            table[self] = self.bits(columns, full, table)
+        return table[self]
+
+    def bits(self, columns, full, table):
+        """Returns the truth table of the sentence, from those of its
+        parts."""
+        raise Exception("nothing to evaluate")
 
     @classmethod
     def validate(cls, sentence):
@@ -43,15 +173,10 @@ class Sentence():
 
 
 class Symbol(Sentence):
+    __slots__ = ("name",)
 
-    def __init__(self, name):
-        self.name = name
-
-    def __eq__(self, other):
-        return isinstance(other, Symbol) and self.name == other.name
-
-    def __hash__(self):
-        return hash(("symbol", self.name))
+    def __new__(cls, name):
+        return cls.intern((name,), frozenset([name]), name=name)
 
     def __repr__(self):
         return self.name
@@ -65,20 +190,31 @@ class Symbol(Sentence):
     def formula(self):
         return self.name
 
-    def symbols(self):
-        return {self.name}
+    def define(self, cnf):
+        return cnf.variable(self.name)
 
+    def diagram(self, bdd):
+        return bdd.variable(self.name)
 
-class Not(Sentence):
-    def __init__(self, operand):
-        Sentence.validate(operand)
-        self.operand = operand
+    def emit(self, positions, lines, names, depth=0):
+        try:
+            return f"m[{positions[self.name]}]"
+        except KeyError:
+            raise Exception(f"variable {self.name} not in model")
+
+    def truth_table(self, columns, full, table):
+        try:
+            return columns[self.name]
+        except KeyError:
+            raise Exception(f"variable {self.name} not in model")
 
-    def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
 
-    def __hash__(self):
-        return hash(("not", hash(self.operand)))
+class Not(Sentence):
+    __slots__ = ("operand",)
+
+    def __new__(cls, operand):
+        Sentence.validate(operand)
+        return cls.intern((operand,), operand=operand)
 
     def __repr__(self):
         return f"Not({self.operand})"
@@ -86,26 +222,30 @@ class Not(Sentence):
     def evaluate(self, model):
         return not self.operand.evaluate(model)
 
+    @cached
     def formula(self):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
-    def symbols(self):
-        return self.operand.symbols()
+    def define(self, cnf):
+        return -cnf.literal(self.operand)
+
+    def diagram(self, bdd):
+        return bdd.negate(bdd.compile(self.operand))
+
+    def expression(self, positions, lines, names, depth):
+        return f"not {self.operand.emit(positions, lines, names, depth)}"
+
+    def bits(self, columns, full, table):
+        return full ^ self.operand.truth_table(columns, full, table)
 
 
 class And(Sentence):
-    def __init__(self, *conjuncts):
+    __slots__ = ("conjuncts",)
+
+    def __new__(cls, *conjuncts):
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
-        self.conjuncts = list(conjuncts)
-
-    def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
-
-    def __hash__(self):
-        return hash(
-            ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
-        )
+        return cls.intern(conjuncts, conjuncts=conjuncts)
 
     def __repr__(self):
         conjunctions = ", ".join(
@@ -114,35 +254,60 @@ class And(Sentence):
         return f"And({conjunctions})"
 
     def add(self, conjunct):
-        Sentence.validate(conjunct)
-        self.conjuncts.append(conjunct)
+        """Sentences are immutable, so a conjunction cannot be added to;
+        build a new one with And(*conjunction.conjuncts, conjunct)."""
+        raise TypeError("And is immutable: use "
+                        "And(*conjunction.conjuncts, conjunct) instead of add")
 
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
 
+    @cached
     def formula(self):
         if len(self.conjuncts) == 1:
             return self.conjuncts[0].formula()
         return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
                            for conjunct in self.conjuncts])
 
-    def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+    def define(self, cnf):
+        literals = [cnf.literal(conjunct) for conjunct in self.conjuncts]
+        if len(literals) == 1:
+            return literals[0]
+        v = cnf.new_var()
+        for literal in literals:
+            cnf.add([-v, literal])
+        cnf.add([v] + [-literal for literal in literals])
+        return v
+
+    def diagram(self, bdd):
+        # Conjoin in order of each conjunct's last variable, so the
+        # diagram grows downwards rather than all over at once
+        nodes = [bdd.compile(conjunct) for conjunct in self.conjuncts]
+        u = TRUE
+        for v in sorted(nodes, key=bdd.bottom):
+            u = bdd.conjoin(u, v)
+        return u
+
+    def expression(self, positions, lines, names, depth):
+        return " and ".join([conjunct.emit(positions, lines, names, depth)
+                             for conjunct in self.conjuncts]) or "True"
+
+    def bits(self, columns, full, table):
+        bits = full
+        for conjunct in self.conjuncts:
+            bits &= conjunct.truth_table(columns, full, table)
+            if not bits:
+                break
+        return bits
 
 
 class Or(Sentence):
-    def __init__(self, *disjuncts):
+    __slots__ = ("disjuncts",)
+
+    def __new__(cls, *disjuncts):
         for disjunct in disjuncts:
             Sentence.validate(disjunct)
-        self.disjuncts = list(disjuncts)
-
-    def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
-
-    def __hash__(self):
-        return hash(
-            ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
-        )
+        return cls.intern(disjuncts, disjuncts=disjuncts)
 
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
@@ -151,30 +316,50 @@ class Or(Sentence):
     def evaluate(self, model):
         return any(disjunct.evaluate(model) for disjunct in self.disjuncts)
 
+    @cached
     def formula(self):
         if len(self.disjuncts) == 1:
             return self.disjuncts[0].formula()
         return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
                             for disjunct in self.disjuncts])
 
-    def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+    def define(self, cnf):
+        literals = [cnf.literal(disjunct) for disjunct in self.disjuncts]
+        if len(literals) == 1:
+            return literals[0]
+        v = cnf.new_var()
+        for literal in literals:
+            cnf.add([v, -literal])
+        cnf.add([-v] + literals)
+        return v
+
+    def diagram(self, bdd):
+        u = FALSE
+        for disjunct in self.disjuncts:
+            u = bdd.disjoin(u, bdd.compile(disjunct))
+        return u
+
+    def expression(self, positions, lines, names, depth):
+        return " or ".join([disjunct.emit(positions, lines, names, depth)
+                            for disjunct in self.disjuncts]) or "False"
+
+    def bits(self, columns, full, table):
+        bits = 0
+        for disjunct in self.disjuncts:
+            bits |= disjunct.truth_table(columns, full, table)
+            if bits == full:
+                break
+        return bits
 
 
 class Implication(Sentence):
-    def __init__(self, antecedent, consequent):
+    __slots__ = ("antecedent", "consequent")
+
+    def __new__(cls, antecedent, consequent):
         Sentence.validate(antecedent)
         Sentence.validate(consequent)
-        self.antecedent = antecedent
-        self.consequent = consequent
-
-    def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
-
-    def __hash__(self):
-        return hash(("implies", hash(self.antecedent), hash(self.consequent)))
+        return cls.intern((antecedent, consequent),
+                          antecedent=antecedent, consequent=consequent)
 
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
@@ -183,29 +368,43 @@ class Implication(Sentence):
         return ((not self.antecedent.evaluate(model))
                 or self.consequent.evaluate(model))
 
+    @cached
     def formula(self):
         antecedent = Sentence.parenthesize(self.antecedent.formula())
         consequent = Sentence.parenthesize(self.consequent.formula())
         return f"{antecedent} => {consequent}"
 
-    def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+    def define(self, cnf):
+        a = cnf.literal(self.antecedent)
+        b = cnf.literal(self.consequent)
+        v = cnf.new_var()
+        cnf.add([-v, -a, b])
+        cnf.add([v, a])
+        cnf.add([v, -b])
+        return v
+
+    def diagram(self, bdd):
+        return bdd.ite(bdd.compile(self.antecedent),
+                       bdd.compile(self.consequent), TRUE)
+
+    def expression(self, positions, lines, names, depth):
+        antecedent = self.antecedent.emit(positions, lines, names, depth)
+        consequent = self.consequent.emit(positions, lines, names, depth)
+        return f"not {antecedent} or {consequent}"
+
+    def bits(self, columns, full, table):
+        antecedent = self.antecedent.truth_table(columns, full, table)
+        consequent = self.consequent.truth_table(columns, full, table)
+        return (full ^ antecedent) | consequent
 
 
 class Biconditional(Sentence):
-    def __init__(self, left, right):
+    __slots__ = ("left", "right")
+
+    def __new__(cls, left, right):
         Sentence.validate(left)
         Sentence.validate(right)
-        self.left = left
-        self.right = right
-
-    def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
-
-    def __hash__(self):
-        return hash(("biconditional", hash(self.left), hash(self.right)))
+        return cls.intern((left, right), left=left, right=right)
 
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
@@ -216,48 +415,258 @@ class Biconditional(Sentence):
                 or (not self.left.evaluate(model)
                     and not self.right.evaluate(model)))
 
+    @cached
     def formula(self):
         left = Sentence.parenthesize(str(self.left))
         right = Sentence.parenthesize(str(self.right))
         return f"{left} <=> {right}"
 
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
-
-
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
-
-    def check_all(knowledge, query, symbols, model):
-        """Checks if knowledge base entails query, given a particular model."""
-
-        # If model has an assignment for each symbol
-        if not symbols:
-
-            # If knowledge base is true in model, then query must also be true
-            if knowledge.evaluate(model):
-                return query.evaluate(model)
-            return True
+    def define(self, cnf):
+        a = cnf.literal(self.left)
+        b = cnf.literal(self.right)
+        v = cnf.new_var()
+        cnf.add([-v, -a, b])
+        cnf.add([-v, a, -b])
+        cnf.add([v, a, b])
+        cnf.add([v, -a, -b])
+        return v
+
+    def diagram(self, bdd):
+        right = bdd.compile(self.right)
+        return bdd.ite(bdd.compile(self.left), right, bdd.negate(right))
+
+    def expression(self, positions, lines, names, depth):
+        left = self.left.emit(positions, lines, names, depth)
+        right = self.right.emit(positions, lines, names, depth)
+        return f"{left} == {right}"
+
+    def bits(self, columns, full, table):
+        left = self.left.truth_table(columns, full, table)
+        right = self.right.truth_table(columns, full, table)
+        return full ^ (left ^ right)
+
+
+class KnowledgeBase():
+    """
+    Sentences known to be true, held as clauses in one SAT solver that
+    is kept between calls. Sentences can be added at any time, and each
+    query only assumes its negation, so what the solver has propagated
+    and learned carries over to later additions and queries.
+
+    Since sentences are only ever added, a query once entailed stays
+    entailed, and the latest models found still rule out queries for as
+    long as every sentence added since holds in them.
+    """
+
+    def __init__(self, *sentences):
+        self.cnf = CNF()
+        self.sentences = []
+        self.entailed = set()
+        # Every symbol name seen, and models of every sentence so far as
+        # lists of bools in that order, so compiled sentences read them
+        self.names = []
+        self.models = []
+        self.compiled = {}
+        for sentence in sentences:
+            self.add(sentence)
+
+    def add(self, sentence):
+        """
+        Adds a sentence to the knowledge base.
+        """
+        self.sentences.append(sentence)
+        self.cnf.assert_sentence(sentence)
+        start = len(self.names)
+        self.extend(sentence)
+        evaluate = self.evaluator(sentence)
+        # Symbols new to the knowledge base can take any values
+        new = len(self.names) - start
+        if new <= EXTEND:
+            choices = list(itertools.product((False, True), repeat=new))
         else:
-
-            # Choose one of the remaining unused symbols
-            remaining = symbols.copy()
-            p = remaining.pop()
-
-            # Create a model where the symbol is true
-            model_true = model.copy()
-            model_true[p] = True
-
-            # Create a model where the symbol is false
-            model_false = model.copy()
-            model_false[p] = False
-
-            # Ensure entailment holds in both models
-            return (check_all(knowledge, query, remaining, model_true) and
-                    check_all(knowledge, query, remaining, model_false))
-
-    # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
-
-    # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
+            choices = [(False,) * new]
+        models = []
+        for model in self.models:
+            for values in choices:
+                model[start:] = values
+                if evaluate(model):
+                    models.append(model)
+                    break
+        self.models = models
+
+    def extend(self, sentence):
+        """
+        Adds a sentence's new symbol names to the order, false in every
+        model so far since no sentence mentions them yet.
+        """
+        new = sorted(sentence.symbols() - set(self.names))
+        self.names.extend(new)
+        for model in self.models:
+            model.extend([False] * len(new))
+
+    def evaluator(self, sentence):
+        """
+        Returns the sentence compiled over the symbol order, which only
+        grows, so it stays right for later models.
+        """
+        if sentence not in self.compiled:
+            self.compiled[sentence] = sentence.compile(self.names)
+        return self.compiled[sentence]
+
+    def consistent(self):
+        """
+        Returns whether the sentences can all be true together.
+        """
+        return bool(self.models) or self.cnf.satisfiable()
+
+    def ask(self, query):
+        """
+        Returns whether the knowledge base entails a query.
+        """
+        return self.ask_many([query])[0]
+
+    def ask_many(self, queries):
+        """
+        Returns a list of whether the knowledge base entails each query.
+        Each pending query is assumed false in turn, and a model found
+        for one also rules out the others that are false in it.
+        """
+        cnf = self.cnf
+        entailed = [True] * len(queries)
+        pending = []
+        for i, query in enumerate(queries):
+            if query in self.entailed:
+                continue
+            self.extend(query)
+            evaluate = self.evaluator(query)
+            for model in self.models:
+                if not evaluate(model):
+                    entailed[i] = False
+                    break
+            else:
+                pending.append(i)
+
+        literals = {i: cnf.literal(queries[i]) for i in pending}
+        while pending:
+            # Prefer models where the other pending queries are false
+            # too, after backtracking saves the last model's phases
+            cnf.solver.backtrack(0)
+            for j in pending:
+                cnf.solver.phase[abs(literals[j])] = literals[j] < 0
+            i = pending.pop()
+            if not cnf.solver.solve([-literals[i]]):
+                self.entailed.add(queries[i])
+                continue
+            entailed[i] = False
+            values = cnf.solver.model
+            self.models = self.models[1 - MODELS:] + [[
+                values[cnf.variables[name]] == 1
+                if name in cnf.variables else False
+                for name in self.names
+            ]]
+            for j in pending:
+                if values[abs(literals[j])] != (1 if literals[j] > 0 else -1):
+                    entailed[j] = False
+            pending = [j for j in pending if entailed[j]]
+        return entailed
+
+
+def model_check(knowledge, query, mode="sat"):
+    """Checks if knowledge base entails query.
+
+    By default this checks with a SAT solver that knowledge base and not
+    query cannot both be true. Mode "truth_table" instead works out both
+    truth tables over every model, many models at a time, and mode
+    "enumerate" evaluates them one model at a time."""
+    return model_check_many(knowledge, [query], mode)[0]
+
+
+def model_check_many(knowledge, queries, mode="sat"):
+    """Returns a list of whether knowledge base entails each query,
+    doing the work on the knowledge base once for all of them."""
+    queries = list(queries)
+    if mode == "sat":
+        return sat_check(knowledge, queries)
+    elif mode == "truth_table":
+        return truth_table_check(knowledge, queries)
+    elif mode == "enumerate":
+        return enumerate_check(knowledge, queries)
+    raise ValueError(f"unknown mode: {mode}")
+
+
+def sat_check(knowledge, queries):
+    """Checks which queries knowledge base entails with one SAT
+    solver."""
+    return KnowledgeBase(knowledge).ask_many(queries)
+
+
+def enumerate_check(knowledge, queries):
+    """Checks which queries knowledge base entails by enumerating every
+    model of their symbols."""
+
+    # Get all symbols in both knowledge and queries
+    symbols = knowledge.symbols()
+    for query in queries:
+        symbols |= query.symbols()
+    symbols = sorted(symbols)
+    knowledge = knowledge.compile(symbols)
+    queries = [query.compile(symbols) for query in queries]
+
+    # If knowledge base is true in a model, then a query entailed must
+    # also be true, so the rest are no longer entailed
+    entailed = [True] * len(queries)
+    pending = list(range(len(queries)))
+    for model in itertools.product((True, False), repeat=len(symbols)):
+        if not pending:
+            break
+        if knowledge(model):
+            for i in pending:
+                if not queries[i](model):
+                    entailed[i] = False
+            pending = [i for i in pending if entailed[i]]
+    return entailed
+
+
+def truth_table_check(knowledge, queries, chunk=CHUNK):
+    """Checks which queries knowledge base entails by working out the
+    truth tables of them all as ints, one bit per model, for 2 ** chunk
+    models at a time so memory stays bounded."""
+    symbols = knowledge.symbols()
+    for query in queries:
+        symbols |= query.symbols()
+    symbols = sorted(symbols)
+    inner = min(chunk, len(symbols))
+    size = 1 << inner
+    full = (1 << size) - 1
+
+    # Within a run of models, the first symbols alternate in blocks
+    # of 1, 2, 4, ... models, and the rest are the same in every model
+    patterns = []
+    for k in range(inner):
+        width = 1 << (k + 1)
+        pattern = ((1 << (1 << k)) - 1) << (1 << k)
+        while width < size:
+            pattern |= pattern << width
+            width *= 2
+        patterns.append(pattern)
+
+    entailed = [True] * len(queries)
+    pending = list(range(len(queries)))
+    for start in range(0, 1 << len(symbols), size):
+        if not pending:
+            break
+        columns = {}
+        for k, symbol in enumerate(symbols):
+            if k < inner:
+                columns[symbol] = patterns[k]
+            else:
+                columns[symbol] = full if start >> k & 1 else 0
+        table = {}
+        models = knowledge.truth_table(columns, full, table)
+        if not models:
+            continue
+        for i in pending:
+            if models & ~queries[i].truth_table(columns, full, table):
+                entailed[i] = False
+        pending = [i for i in pending if entailed[i]]
+    return entailed
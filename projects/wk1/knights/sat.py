@@ -0,0 +1,377 @@
+import heapq
+
+# Conflicts before the first restart, scaled by the Luby sequence
+RESTART = 100
+
+# Factor variable activities decay by at each conflict
+DECAY = 0.95
+
+
+class Solver():
+    """
+    CDCL SAT solver over clauses of nonzero integer literals, where -v
+    is the negation of variable v.
+
+    Each clause watches two of its literals and is only visited when one
+    of them becomes false. Conflicts are analysed back to the first UIP
+    and the learned clause kept, so it keeps pruning in later calls to
+    solve. Clauses can be added between calls.
+    """
+
+    def __init__(self):
+        # Per variable, from 1: 1 true, -1 false or 0 unassigned,
+        # the decision level and implying clause, and branching data
+        self.values = [0]
+        self.levels = [0]
+        self.reasons = [None]
+        self.activity = [0.0]
+        self.phase = [False]
+        # Clauses watching each literal, by code(literal)
+        self.watches = [[], []]
+        self.clauses = []
+        self.learned = 0
+        self.trail = []
+        # Trail length at the start of each decision level
+        self.limits = []
+        self.head = 0
+        self.heap = []
+        self.increment = 1.0
+        self.ok = True
+        self.conflicts = 0
+        self.decisions = 0
+        self.propagations = 0
+        self.model = None
+
+    def new_var(self):
+        """
+        Returns a new variable.
+        """
+        self.values.append(0)
+        self.levels.append(0)
+        self.reasons.append(None)
+        self.activity.append(0.0)
+        self.phase.append(False)
+        self.watches.extend([[], []])
+        var = len(self.values) - 1
+        heapq.heappush(self.heap, (0.0, var))
+        return var
+
+    def value(self, literal):
+        """
+        Returns 1 if a literal is true, -1 if false, 0 if unassigned.
+        """
+        value = self.values[abs(literal)]
+        return value if literal > 0 else -value
+
+    def add_clause(self, literals):
+        """
+        Adds a clause, returning False if the clauses are now
+        unsatisfiable whatever is assumed.
+        """
+        if not self.ok:
+            return False
+        self.backtrack(0)
+        clause = []
+        for literal in set(literals):
+            if -literal in clause or self.value(literal) == 1:
+                # Always true
+                return True
+            if self.value(literal) == 0:
+                clause.append(literal)
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self.enqueue(clause[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self.attach(clause)
+        return self.ok
+
+    def attach(self, clause):
+        """
+        Stores a clause, watching its first two literals.
+        """
+        index = len(self.clauses)
+        self.clauses.append(clause)
+        self.watches[code(clause[0])].append(index)
+        self.watches[code(clause[1])].append(index)
+        return index
+
+    def enqueue(self, literal, reason):
+        """
+        Makes a literal true at the current decision level.
+        """
+        var = abs(literal)
+        self.values[var] = 1 if literal > 0 else -1
+        self.levels[var] = len(self.limits)
+        self.reasons[var] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        """
+        Makes every literal true that is the last one left unassigned in
+        a clause, returning the index of a clause found false, or None.
+        """
+        values = self.values
+        clauses = self.clauses
+        watches = self.watches
+        while self.head < len(self.trail):
+            false = -self.trail[self.head]
+            self.head += 1
+            self.propagations += 1
+            watching = watches[code(false)]
+            kept = watches[code(false)] = []
+            for i, index in enumerate(watching):
+                clause = clauses[index]
+                # Keep the literal that just became false second
+                if clause[0] == false:
+                    clause[0], clause[1] = clause[1], false
+                first = clause[0]
+                var = abs(first)
+                if values[var] == (1 if first > 0 else -1):
+                    kept.append(index)
+                    continue
+                for k in range(2, len(clause)):
+                    literal = clause[k]
+                    value = values[abs(literal)]
+                    if value != (-1 if literal > 0 else 1):
+                        # Watch a literal that is not false instead
+                        clause[1], clause[k] = literal, false
+                        watches[code(literal)].append(index)
+                        break
+                else:
+                    kept.append(index)
+                    if values[var] == 0:
+                        self.enqueue(first, index)
+                    else:
+                        kept.extend(watching[i + 1:])
+                        self.head = len(self.trail)
+                        return index
+        return None
+
+    def analyze(self, conflict):
+        """
+        Returns a clause learned from a conflict, asserting at the
+        first UIP, and the level to backjump to.
+        """
+        levels = self.levels
+        level = len(self.limits)
+        learned = [None]
+        seen = set()
+        pending = 0
+        literal = None
+        index = len(self.trail) - 1
+        clause = self.clauses[conflict]
+        while True:
+            for other in clause:
+                var = abs(other)
+                if literal is not None and var == abs(literal):
+                    continue
+                if var not in seen and levels[var] > 0:
+                    seen.add(var)
+                    self.bump(var)
+                    if levels[var] == level:
+                        pending += 1
+                    else:
+                        learned.append(other)
+            # The latest literal on the trail involved in the conflict
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            literal = self.trail[index]
+            index -= 1
+            pending -= 1
+            if not pending:
+                break
+            clause = self.clauses[self.reasons[abs(literal)]]
+        learned[0] = -literal
+
+        # Backjump to the deepest level of the rest of the clause,
+        # watching a literal from that level second
+        backjump = 0
+        for i in range(1, len(learned)):
+            if levels[abs(learned[i])] > backjump:
+                backjump = levels[abs(learned[i])]
+                learned[1], learned[i] = learned[i], learned[1]
+        return learned, backjump
+
+    def bump(self, var):
+        """
+        Raises a variable's activity, so it is branched on sooner.
+        """
+        self.activity[var] += self.increment
+        if self.activity[var] > 1e100:
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.increment *= 1e-100
+            self.rebuild()
+        elif not self.values[var]:
+            heapq.heappush(self.heap, (-self.activity[var], var))
+
+    def rebuild(self):
+        """
+        Rebuilds the branching heap from the unassigned variables.
+        """
+        self.heap = [(-self.activity[var], var)
+                     for var in range(1, len(self.values))
+                     if not self.values[var]]
+        heapq.heapify(self.heap)
+
+    def backtrack(self, level):
+        """
+        Undoes every assignment above a decision level.
+        """
+        if len(self.limits) <= level:
+            return
+        start = self.limits[level]
+        for literal in self.trail[start:]:
+            var = abs(literal)
+            self.phase[var] = literal > 0
+            self.values[var] = 0
+            self.reasons[var] = None
+            heapq.heappush(self.heap, (-self.activity[var], var))
+        del self.trail[start:]
+        del self.limits[level:]
+        self.head = len(self.trail)
+        if len(self.heap) > 4 * len(self.values):
+            self.rebuild()
+
+    def branch(self):
+        """
+        Returns the unassigned variable with the highest activity,
+        or None if every variable is assigned.
+        """
+        while self.heap:
+            _, var = heapq.heappop(self.heap)
+            if not self.values[var]:
+                return var
+        return None
+
+    def solve(self, assumptions=()):
+        """
+        Returns True if the clauses are satisfiable with every assumed
+        literal true, leaving a satisfying assignment in `model`.
+        """
+        self.model = None
+        if not self.ok:
+            return False
+        self.backtrack(0)
+        restarts = 0
+        limit = RESTART
+        conflicts = 0
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                conflicts += 1
+                if not self.limits:
+                    self.ok = False
+                    return False
+                learned, level = self.analyze(conflict)
+                self.backtrack(level)
+                if len(learned) == 1:
+                    self.enqueue(learned[0], None)
+                else:
+                    self.learned += 1
+                    self.enqueue(learned[0], self.attach(learned))
+                self.increment /= DECAY
+                continue
+
+            if conflicts >= limit:
+                restarts += 1
+                limit = RESTART * luby(restarts)
+                conflicts = 0
+                self.backtrack(0)
+                continue
+
+            # Assumptions are decided first, one level each
+            if len(self.limits) < len(assumptions):
+                literal = assumptions[len(self.limits)]
+                if self.value(literal) == -1:
+                    return False
+                self.limits.append(len(self.trail))
+                if self.value(literal) == 0:
+                    self.enqueue(literal, None)
+                continue
+
+            var = self.branch()
+            if var is None:
+                self.model = list(self.values)
+                return True
+            self.decisions += 1
+            self.limits.append(len(self.trail))
+            self.enqueue(var if self.phase[var] else -var, None)
+
+
+def code(literal):
+    """
+    Returns the index of a literal's watch list.
+    """
+    return 2 * literal if literal > 0 else -2 * literal + 1
+
+
+def luby(i):
+    """
+    Returns the i-th term, from 1, of the Luby sequence 1, 1, 2, 1, 1,
+    2, 4, ...
+    """
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    while (1 << k) - 1 != i:
+        i -= (1 << (k - 1)) - 1
+        k = 1
+        while (1 << k) - 1 < i:
+            k += 1
+    return 1 << (k - 1)
+
+
+class CNF():
+    """
+    Clauses in a Solver built from logical sentences by the Tseitin
+    transformation: each compound sentence gets a variable defined to be
+    equivalent to it, so the clauses grow linearly with the sentences.
+    """
+
+    def __init__(self, solver=None):
+        self.solver = solver if solver is not None else Solver()
+        # Variable for each symbol name, and literal for each sentence
+        self.variables = {}
+        self.literals = {}
+        self.true = self.solver.new_var()
+        self.solver.add_clause([self.true])
+
+    def variable(self, name):
+        """
+        Returns the variable for a symbol name.
+        """
+        if name not in self.variables:
+            self.variables[name] = self.solver.new_var()
+        return self.variables[name]
+
+    def literal(self, sentence):
+        """
+        Returns a literal equivalent to a sentence, adding the clauses
+        that define it the first time the sentence is seen.
+        """
+        if sentence not in self.literals:
+            self.literals[sentence] = sentence.define(self)
+        return self.literals[sentence]
+
+    def new_var(self):
+        return self.solver.new_var()
+
+    def add(self, clause):
+        return self.solver.add_clause(clause)
+
+    def assert_sentence(self, sentence):
+        """
+        Adds a sentence as true.
+        """
+        for conjunct in getattr(sentence, "conjuncts", None) or [sentence]:
+            self.add([self.literal(conjunct)])
+
+    def satisfiable(self, *sentences):
+        """
+        Returns whether the asserted sentences can all be true
+        together with some further sentences, which are only assumed.
+        """
+        return self.solver.solve([self.literal(s) for s in sentences])